@@ -0,0 +1,223 @@
+"""
+Version-aware response cache for the read-only endpoints.
+
+Every endpoint returns the same payload until the next ETL run, so
+`ResponseCacheMiddleware` stores the serialized JSON body of successful
+GET responses and replays the bytes on later requests without running
+the router (or its SQL) again. Entries are keyed on the route path, the
+sorted query parameters and the data generation, a counter in the
+`etl_generation` table that `etl.py` bumps after refreshing the
+materialized views. A new generation therefore never reuses an old
+entry; stale entries simply age out of the LRU.
+
+Responses carry a strong `ETag` derived from the generation and the
+body, plus `Cache-Control: no-cache`, so browsers and proxies revalidate
+with `If-None-Match` and receive a bodyless 304 when nothing changed.
+
+The cache lives in each worker process and is bounded by
+`RESPONSE_CACHE_MB` megabytes of body data (0 disables it). The
+generation is taken from the current snapshot when one is served, and
+otherwise read from the database at most every
+`CACHE_GENERATION_TTL` seconds. Counters are exposed at `/cache/stats`.
+"""
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MB = float(os.getenv("RESPONSE_CACHE_MB", "64"))
+CACHE_GENERATION_TTL = float(os.getenv("CACHE_GENERATION_TTL", "5"))
+
+# Path prefixes that are never cached
+UNCACHED_PREFIXES = ("/cache", "/refresh", "/metrics", "/export", "/docs", "/redoc", "/openapi.json")
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    media_type: str
+    # Route that produced the body, restored on replay for `metrics.py`
+    route: Any = None
+
+
+class ResponseCache:
+    """
+    LRU map from cache keys to serialized responses, evicting the least
+    recently used entries once the total body size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Tuple) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Tuple, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size_bytes -= len(old.body)
+        self._entries[key] = entry
+        self.size_bytes += len(entry.body)
+        while self.size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted.body)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+
+class GenerationTracker:
+    """
+    Current data generation: the snapshot's when the app serves one,
+    otherwise `etl_generation.generation` polled with a TTL. Returns
+    None when it cannot be determined, which disables caching.
+    """
+
+    def __init__(self, engine: AsyncEngine, ttl: float):
+        self.engine = engine
+        self.ttl = ttl
+        self.generation: Optional[int] = None
+        self._checked = float("-inf")
+
+    async def current(self, app) -> Optional[int]:
+        source = getattr(app.state, "snapshots", None)
+        snapshot = source.current() if source is not None else None
+        if snapshot is not None and snapshot.generation is not None:
+            return snapshot.generation
+        now = time.monotonic()
+        if now - self._checked >= self.ttl:
+            self._checked = now
+            try:
+                async with self.engine.connect() as conn:
+                    self.generation = await conn.scalar(text("SELECT generation FROM etl_generation"))
+            except Exception:
+                logger.exception("Could not read etl_generation; responses are not cached")
+                self.generation = None
+        return self.generation
+
+
+def make_etag(generation: int, body: bytes) -> str:
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    return f'"g{generation}-{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class ResponseCacheMiddleware:
+    """
+    ASGI middleware serving cached GET responses and recording new ones.
+    Only 200 responses with a JSON body are stored.
+    """
+
+    def __init__(self, app, cache: ResponseCache, generations: GenerationTracker):
+        self.app = app
+        self.cache = cache
+        self.generations = generations
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not self.cache.enabled
+            or scope["path"].startswith(UNCACHED_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+        generation = await self.generations.current(scope["app"])
+        if generation is None:
+            await self.app(scope, receive, send)
+            return
+        query = tuple(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+        key = (scope["path"], query, generation)
+        headers = dict(scope["headers"])
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            scope["route"] = entry.route
+            await self._replay(entry, if_none_match, send)
+            return
+
+        start = None
+        passthrough = False
+        chunks = []
+
+        async def capture(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                media_type = dict(message["headers"]).get(b"content-type", b"").decode("latin-1")
+                if message["status"] != 200 or not media_type.startswith("application/json"):
+                    # Errors and streamed or binary bodies go straight out
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            media_type = dict(start["headers"])[b"content-type"].decode("latin-1")
+            entry = CachedResponse(
+                body=body, etag=make_etag(generation, body), media_type=media_type, route=scope.get("route")
+            )
+            self.cache.put(key, entry)
+            await self._replay(entry, if_none_match, send)
+
+        await self.app(scope, receive, capture)
+
+    async def _replay(self, entry: CachedResponse, if_none_match: str, send) -> None:
+        headers = [
+            (b"etag", entry.etag.encode("latin-1")),
+            (b"cache-control", b"no-cache"),
+        ]
+        if if_none_match and etag_matches(if_none_match, entry.etag):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers += [
+            (b"content-type", entry.media_type.encode("latin-1")),
+            (b"content-length", str(len(entry.body)).encode("latin-1")),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
@@ -0,0 +1,212 @@
+"""
+Behavioural clustering of traders into archetypes.
+
+The ETL (`etl.py`) runs this after refreshing the materialized views: it
+streams one row of behavioural features per trader out of the database
+in chunks and fits a mini-batch k-means model (Sculley, 2010) with the
+vectorised NumPy implementation below. Every pass touches each trader
+once and holds only one chunk plus the model in memory, so the cost is
+linear in the number of traders and memory is bounded by the chunk
+size. All randomness comes from one seeded generator and the stream
+order is fixed, so a given dataset and seed always give the same
+archetypes.
+
+Features (see `FEATURES`):
+* `z_plpt`, `z_plpv`, `z_plvwt`: price impact z-scores from `trader_stats`
+* `transactions_per_day` and `std_time_vw`, log-scaled because both are
+  heavy tailed (`z_std_time_vw` is just a linear rescaling of the
+  latter, so it is not used separately)
+* `niche_score` from `trader_topic_metrics`
+
+Each feature is standardised with the population mean and standard
+deviation, clipped to +/- `CLIP` and missing values are imputed with
+the mean (0 after standardisation).
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FEATURES = [
+    "z_plpt",
+    "z_plpv",
+    "z_plvwt",
+    "transactions_per_day",
+    "std_time_vw",
+    "niche_score",
+]
+
+# Features that are log1p-transformed before standardisation
+LOG_FEATURES = {"transactions_per_day", "std_time_vw"}
+
+# Human readable names used to describe centroids
+FEATURE_LABELS = {
+    "z_plpt": "impact per trade",
+    "z_plpv": "impact per volume",
+    "z_plvwt": "weighted impact per trade",
+    "transactions_per_day": "trading frequency",
+    "std_time_vw": "timing spread",
+    "niche_score": "topic focus",
+}
+
+# Standardised feature values are clipped to this magnitude
+CLIP = 5.0
+
+DEFAULT_CLUSTERS = 8
+BATCH_SIZE = 1024
+EPOCHS = 3
+
+
+def transform(raw: np.ndarray) -> np.ndarray:
+    """Apply the per-feature transforms to a raw (n, features) matrix."""
+    out = np.array(raw, dtype=np.float64)
+    for j, name in enumerate(FEATURES):
+        if name in LOG_FEATURES:
+            out[:, j] = np.log1p(np.maximum(out[:, j], 0))
+    return out
+
+
+class StreamingScaler:
+    """Mean and standard deviation of each feature, accumulated chunk by chunk."""
+
+    def __init__(self, n_features: int):
+        self.n = np.zeros(n_features)
+        self.total = np.zeros(n_features)
+        self.squares = np.zeros(n_features)
+
+    def update(self, values: np.ndarray) -> None:
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        self.n += valid.sum(axis=0)
+        self.total += filled.sum(axis=0)
+        self.squares += (filled ** 2).sum(axis=0)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return np.divide(self.total, self.n, out=np.zeros_like(self.total), where=self.n > 0)
+
+    @property
+    def std(self) -> np.ndarray:
+        var = np.divide(self.squares, self.n, out=np.zeros_like(self.total), where=self.n > 0) - self.mean ** 2
+        std = np.sqrt(np.maximum(var, 0))
+        return np.where(std > 0, std, 1.0)
+
+    def scale(self, values: np.ndarray) -> np.ndarray:
+        scaled = (values - self.mean) / self.std
+        return np.clip(np.nan_to_num(scaled, nan=0.0), -CLIP, CLIP)
+
+
+class Reservoir:
+    """
+    Uniform sample of `size` rows from a stream: every row gets a random
+    key and the rows with the smallest keys are kept.
+    """
+
+    def __init__(self, size: int, rng: np.random.Generator):
+        self.size = size
+        self.rng = rng
+        self.keys = np.empty(0)
+        self.rows: Optional[np.ndarray] = None
+
+    def update(self, values: np.ndarray) -> None:
+        keys = np.concatenate([self.keys, self.rng.random(len(values))])
+        rows = values if self.rows is None else np.concatenate([self.rows, values])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size - 1)[: self.size]
+            keys, rows = keys[keep], rows[keep]
+        self.keys, self.rows = keys, rows
+
+
+def squared_distances(x: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """(n, k) matrix of squared Euclidean distances."""
+    d = (x ** 2).sum(axis=1)[:, None] - 2 * x @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(d, 0)
+
+
+class MiniBatchKMeans:
+    """
+    Mini-batch k-means with k-means++ initialisation. Each center moves
+    towards the mean of the batch points assigned to it with a per-center
+    learning rate of 1 / (points seen so far), which is the vectorised
+    form of Sculley's update.
+    """
+
+    def __init__(self, n_clusters: int, rng: np.random.Generator):
+        self.n_clusters = n_clusters
+        self.rng = rng
+        self.centers: Optional[np.ndarray] = None
+        self.counts = np.zeros(n_clusters)
+
+    def init(self, sample: np.ndarray) -> None:
+        """Choose initial centers from `sample` with k-means++."""
+        k = min(self.n_clusters, len(sample))
+        centers = [sample[self.rng.integers(len(sample))]]
+        closest = squared_distances(sample, centers[0][None, :])[:, 0]
+        for _ in range(1, k):
+            total = closest.sum()
+            if total > 0:
+                i = self.rng.choice(len(sample), p=closest / total)
+            else:
+                i = self.rng.integers(len(sample))
+            centers.append(sample[i])
+            closest = np.minimum(closest, squared_distances(sample, sample[i][None, :])[:, 0])
+        self.centers = np.array(centers)
+        self.n_clusters = k
+        self.counts = np.zeros(k)
+
+    def predict(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest center of each row and the distance to it."""
+        d = squared_distances(x, self.centers)
+        labels = d.argmin(axis=1)
+        return labels, np.sqrt(d[np.arange(len(x)), labels])
+
+    def partial_fit(self, x: np.ndarray) -> None:
+        labels, _ = self.predict(x)
+        counts = np.bincount(labels, minlength=self.n_clusters)
+        sums = np.column_stack(
+            [np.bincount(labels, weights=x[:, j], minlength=self.n_clusters) for j in range(x.shape[1])]
+        )
+        self.counts += counts
+        hit = counts > 0
+        self.centers[hit] += (sums[hit] - counts[hit, None] * self.centers[hit]) / self.counts[hit, None]
+
+    def fit_chunk(self, x: np.ndarray, batch_size: int = BATCH_SIZE) -> None:
+        """Shuffle a chunk and feed it to `partial_fit` in mini-batches."""
+        x = x[self.rng.permutation(len(x))]
+        for start in range(0, len(x), batch_size):
+            self.partial_fit(x[start:start + batch_size])
+
+    def reseed_empty(self, sample: np.ndarray) -> None:
+        """Move centers that never won a point onto the worst-fit sample rows."""
+        empty = np.flatnonzero(self.counts == 0)
+        if len(empty):
+            _, distance = self.predict(sample)
+            self.centers[empty] = sample[np.argsort(-distance)[: len(empty)]]
+
+
+def describe(center: np.ndarray, parts: int = 2, threshold: float = 0.5) -> str:
+    """
+    Name a standardised centroid after its `parts` most distinctive
+    features, listed in `FEATURES` order.
+    """
+    order = np.argsort(-np.abs(center), kind="stable")[:parts]
+    chosen = sorted(j for j in order if abs(center[j]) >= threshold)
+    words = [f"{'High' if center[j] > 0 else 'Low'} {FEATURE_LABELS[FEATURES[j]]}" for j in chosen]
+    return ", ".join(words) if words else "Typical"
+
+
+def name_clusters(centers: np.ndarray) -> List[str]:
+    """
+    Describe every centroid. Names that collide are extended with a
+    third feature, and numbered if they still collide.
+    """
+    names = [describe(center) for center in centers]
+    names = [
+        describe(center, parts=3) if names.count(name) > 1 else name
+        for center, name in zip(centers, names)
+    ]
+    seen: Dict[str, int] = {}
+    unique = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        unique.append(name if names.count(name) == 1 else f"{name} ({seen[name]})")
+    return unique
@@ -0,0 +1,319 @@
+"""
+Memory-mapped columnar file format used for trader snapshots.
+
+A file holds named fixed-width NumPy arrays plus variable-width string
+columns, which are stored as an int64 offsets array into a UTF-8 byte
+blob. The layout is
+
+    magic (8 bytes) | header length (uint64) | JSON header | arrays
+
+and every array starts on a 64-byte boundary, so readers can view it in
+place from a read-only `numpy.memmap` without copying. The operating
+system shares those pages between all processes that map the same file,
+so many uvicorn workers serving one snapshot hold a single copy of it.
+
+Files are written under a temporary name and renamed into place, so a
+reader never observes a partially written file.
+
+`HashIndex` maps the strings of a column to their row indices with an
+open-addressing table stored as an ordinary int32 array, so it can be
+written to and mapped from the same file.
+"""
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"SIFCOL01"
+ALIGNMENT = 64
+
+# 64-bit FNV-1a
+FNV_OFFSET = 0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+UINT64_MASK = (1 << 64) - 1
+
+
+def fnv1a(key: bytes) -> int:
+    """64-bit FNV-1a hash of `key`."""
+    h = FNV_OFFSET
+    for byte in key:
+        h = ((h ^ byte) * FNV_PRIME) & UINT64_MASK
+    return h
+
+
+def fnv1a_strings(offsets: np.ndarray, data: np.ndarray) -> np.ndarray:
+    """
+    `fnv1a` of every string of an offsets/data pair, vectorised across
+    strings: one pass per byte position rather than per string.
+    """
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    hashes = np.full(len(lengths), FNV_OFFSET, dtype=np.uint64)
+    prime = np.uint64(FNV_PRIME)
+    for position in range(int(lengths.max()) if len(lengths) else 0):
+        active = np.flatnonzero(lengths > position)
+        # uint64 multiplication wraps around, as the hash requires
+        hashes[active] = (hashes[active] ^ data[starts[active] + position]) * prime
+    return hashes
+
+
+class StringColumn:
+    """
+    Read-only column of strings backed by an offsets array (length n + 1)
+    and a UTF-8 byte blob. Lookups assume the column is sorted by UTF-8
+    bytes, which is code point order and matches `COLLATE "C"`.
+    """
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, values: Iterable[str]) -> "StringColumn":
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(offsets, data)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _bytes(self, i: int) -> bytes:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self._bytes(i).decode("utf-8")
+
+    def take(self, indices: Iterable[int]) -> List[str]:
+        """Return the strings at `indices` as a list."""
+        return [self[int(i)] for i in indices]
+
+    def bisect_left(self, key: str) -> int:
+        """Index of the first entry >= `key` in a sorted column."""
+        return self._bisect(key.encode("utf-8"), right=False)
+
+    def bisect_right(self, key: str) -> int:
+        """Index of the first entry > `key` in a sorted column."""
+        return self._bisect(key.encode("utf-8"), right=True)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Half-open range of rows starting with `prefix` in a sorted column."""
+        target = prefix.encode("utf-8")
+        lo = self._bisect(target, right=False)
+        # Entries cut to the prefix's length are sorted too, and the
+        # matches are exactly those equal to it
+        return lo, self._bisect(target, right=True, length=len(target), lo=lo)
+
+    def _bisect(self, target: bytes, right: bool, length: Optional[int] = None, lo: int = 0) -> int:
+        hi = len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._bytes(mid)
+            if length is not None:
+                value = value[:length]
+            if value < target or (right and value == target):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key: str) -> Optional[int]:
+        """Row index of `key` in a sorted column, or None if absent."""
+        i = self.bisect_left(key)
+        if i < len(self) and self[i] == key:
+            return i
+        return None
+
+    def hashes(self) -> np.ndarray:
+        """`fnv1a` of every entry as uint64."""
+        return fnv1a_strings(self.offsets, self.data)
+
+
+class HashIndex:
+    """
+    Hash table from the entries of a `StringColumn` to their row
+    indices. `slots` has a power-of-two length of at least twice the
+    number of rows and holds row indices (-1 for empty slots), placed
+    by linear probing from `fnv1a(entry) & (len(slots) - 1)`. A lookup
+    hashes the key and compares a slot or two, instead of the ~log2(n)
+    string comparisons of `StringColumn.find`, and works whether or not
+    the column is sorted.
+    """
+
+    def __init__(self, keys: StringColumn, slots: np.ndarray):
+        self.keys = keys
+        self.slots = slots
+        self.mask = len(slots) - 1
+
+    @staticmethod
+    def build_slots(hashes: np.ndarray) -> np.ndarray:
+        """
+        Slot table for rows with the given `fnv1a` hashes. Rows are
+        placed in rounds: every row still unplaced bids for its current
+        probe slot, the lowest row wins each free slot and the others
+        move on to the next slot. Slots are never freed, so every row
+        ends up after an unbroken run of occupied slots from its home
+        slot, which is all a linear-probing lookup needs.
+        """
+        size = 1 << max(1, int(2 * len(hashes) - 1).bit_length())
+        mask = np.uint64(size - 1)
+        slots = np.full(size, -1, dtype=np.int32)
+        probe = (hashes & mask).astype(np.int64)
+        pending = np.arange(len(hashes))
+        while len(pending):
+            position = probe[pending]
+            free = slots[position] < 0
+            # np.unique keeps the first (lowest) row bidding for each slot
+            taken, first = np.unique(position[free], return_index=True)
+            winners = pending[free][first]
+            slots[taken] = winners
+            placed = np.zeros(len(hashes), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed[pending]]
+            probe[pending] = (probe[pending] + 1) & (size - 1)
+        return slots
+
+    def find(self, key: str) -> Optional[int]:
+        """Row index of `key`, or None if absent."""
+        encoded = key.encode("utf-8")
+        slot = fnv1a(encoded) & self.mask
+        while True:
+            row = int(self.slots[slot])
+            if row < 0:
+                return None
+            if self.keys._bytes(row) == encoded:
+                return row
+            slot = (slot + 1) & self.mask
+
+
+class ColumnarWriter:
+    """
+    Incrementally write a columnar file. Columns are appended chunk by
+    chunk and spooled to temporary files next to the target, so memory
+    use is bounded by the chunk size; `close` assembles the final file
+    and renames it into place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tmpdir = tempfile.mkdtemp(prefix=".columnar-", dir=os.path.dirname(path) or ".")
+        self._spools: Dict[str, Any] = {}
+        self._dtypes: Dict[str, np.dtype] = {}
+        self._shapes: Dict[str, tuple] = {}
+        self._rows: Dict[str, int] = {}
+        self._string_sizes: Dict[str, int] = {}
+
+    def _spool(self, name: str):
+        if name not in self._spools:
+            self._spools[name] = open(os.path.join(self._tmpdir, f"{len(self._spools)}.bin"), "wb")
+        return self._spools[name]
+
+    def append(self, name: str, array: np.ndarray) -> None:
+        """Append rows to a fixed-width column."""
+        array = np.ascontiguousarray(array)
+        if name in self._dtypes:
+            if array.dtype != self._dtypes[name] or array.shape[1:] != self._shapes[name]:
+                raise ValueError(f"Column {name!r} changed type between chunks")
+        else:
+            self._dtypes[name] = array.dtype
+            self._shapes[name] = array.shape[1:]
+            self._rows[name] = 0
+        self._spool(name).write(array.tobytes())
+        self._rows[name] += array.shape[0]
+
+    def append_strings(self, name: str, values: Iterable[str]) -> None:
+        """Append rows to a string column."""
+        encoded = [value.encode("utf-8") for value in values]
+        if name not in self._string_sizes:
+            self._string_sizes[name] = 0
+            self.append(f"{name}.offsets", np.zeros(1, dtype=np.int64))
+        ends = self._string_sizes[name] + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+        self.append(f"{name}.offsets", ends)
+        self.append(f"{name}.data", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        if len(ends):
+            self._string_sizes[name] = int(ends[-1])
+
+    def read(self, name: str) -> np.ndarray:
+        """
+        Everything appended to a fixed-width column so far, read back
+        from its spool. Used to derive columns that need a whole column,
+        such as ranks, before the file is closed.
+        """
+        spool = self._spools[name]
+        spool.flush()
+        return np.fromfile(spool.name, dtype=self._dtypes[name]).reshape((-1,) + self._shapes[name])
+
+    def abort(self) -> None:
+        """Discard everything written so far."""
+        for spool in self._spools.values():
+            spool.close()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def close(self, meta: Optional[Dict[str, Any]] = None) -> None:
+        """Write the header and all spooled columns, then publish the file."""
+        try:
+            for spool in self._spools.values():
+                spool.close()
+            columns = {}
+            offset = 0
+            for name, dtype in self._dtypes.items():
+                shape = (self._rows[name],) + self._shapes[name]
+                columns[name] = {"dtype": dtype.str, "shape": list(shape), "offset": offset}
+                offset += _aligned(int(np.prod(shape)) * dtype.itemsize)
+            header = json.dumps(
+                {"meta": meta or {}, "strings": list(self._string_sizes), "columns": columns}
+            ).encode("utf-8")
+            data_start = _aligned(len(MAGIC) + 8 + len(header))
+            tmp_path = os.path.join(self._tmpdir, "output")
+            with open(tmp_path, "wb") as out:
+                out.write(MAGIC)
+                out.write(np.uint64(len(header)).tobytes())
+                out.write(header)
+                for name, info in columns.items():
+                    out.seek(data_start + info["offset"])
+                    with open(self._spools[name].name, "rb") as spool:
+                        shutil.copyfileobj(spool, out, 1 << 20)
+                out.truncate(data_start + offset)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self.path)
+        finally:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+class ColumnarFile:
+    """
+    Read-only view of a columnar file. `arrays` maps column names to
+    NumPy views over a shared memory map and `strings` maps string
+    column names to `StringColumn` objects over the same map.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mmap = np.memmap(path, dtype=np.uint8, mode="r")
+        if self._mmap[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{path} is not a columnar snapshot file")
+        header_len = int(self._mmap[len(MAGIC): len(MAGIC) + 8].view(np.uint64)[0])
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start: header_start + header_len].tobytes())
+        data_start = _aligned(header_start + header_len)
+        self.meta: Dict[str, Any] = header["meta"]
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, info in header["columns"].items():
+            dtype = np.dtype(info["dtype"])
+            shape = tuple(info["shape"])
+            start = data_start + info["offset"]
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            self.arrays[name] = self._mmap[start: start + nbytes].view(dtype).reshape(shape)
+        self.strings: Dict[str, StringColumn] = {
+            name: StringColumn(self.arrays.pop(f"{name}.offsets"), self.arrays.pop(f"{name}.data"))
+            for name in header["strings"]
+        }
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,220 @@
+"""
+Density binning and downsampling for the footprint vs edge plot.
+
+A scatter of the top traders by |PnL| is biased toward whales and grows
+linearly with the number of points. `density` instead bins every
+trader's (footprint, edge) pair into a rectangular grid or a hexagonal
+lattice with vectorised NumPy, so the payload depends only on the
+number of occupied cells.
+
+Each axis can be linear, `log` (base 10, non-positive values are
+excluded) or `symlog` (sign(v) * log10(1 + |v| / linthresh), linear
+near zero). Binning happens in the transformed space between the
+`clip` and `1 - clip` quantiles; values outside that range are counted
+as clipped rather than stretching the bins.
+
+Only occupied cells are returned, as parallel `x_index`, `y_index` and
+`counts` lists. For the grid, cell (i, j) spans `edges[i]..edges[i+1]`
+on each axis (in data units). For hexbins the indices are doubled
+lattice coordinates: the cell centre is `lo + index * step / 2` in the
+transformed space of each axis.
+
+Individual points can be returned alongside the bins:
+* `stratified`: a sample spread over the occupied cells in proportion
+  to their counts, with every occupied cell represented where `sample`
+  allows it.
+* `outliers`: the points furthest from the median in IQR units, which
+  includes clipped points first.
+Sampling is seeded, so a given request always returns the same points.
+"""
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas import DensityAxis, FootprintDensityResponse, FootprintPoint
+
+class AxisTransform:
+    """Forward and inverse transform of one axis."""
+
+    def __init__(self, scale: str, values: np.ndarray):
+        self.scale = scale
+        self.linthresh: Optional[float] = None
+        if scale == "symlog":
+            # Linear region sized to the data: the 5th percentile of |v|
+            nonzero = np.abs(values[values != 0])
+            self.linthresh = float(np.quantile(nonzero, 0.05)) if len(nonzero) else 1.0
+
+    def valid(self, values: np.ndarray) -> np.ndarray:
+        return values > 0 if self.scale == "log" else np.ones(len(values), dtype=bool)
+
+    def forward(self, values: np.ndarray) -> np.ndarray:
+        if self.scale == "log":
+            return np.log10(values)
+        if self.scale == "symlog":
+            return np.sign(values) * np.log10(1 + np.abs(values) / self.linthresh)
+        return values
+
+    def inverse(self, values: np.ndarray) -> np.ndarray:
+        if self.scale == "log":
+            return 10.0 ** values
+        if self.scale == "symlog":
+            return np.sign(values) * (10.0 ** np.abs(values) - 1) * self.linthresh
+        return values
+
+
+def _range(t: np.ndarray, clip: float) -> Tuple[float, float]:
+    if not len(t):
+        return 0.0, 1.0
+    lo, hi = np.quantile(t, [clip, 1 - clip]) if clip > 0 else (t.min(), t.max())
+    if lo == hi:
+        # Degenerate axis; widen so the single value falls in one bin
+        lo, hi = lo - 0.5, hi + 0.5
+    return float(lo), float(hi)
+
+
+def grid_cells(tx, ty, x_range, y_range, x_bins, y_bins) -> Tuple[np.ndarray, np.ndarray]:
+    """Rectangular cell index of every point along each axis."""
+    ix = np.floor((tx - x_range[0]) / (x_range[1] - x_range[0]) * x_bins).astype(np.int64)
+    iy = np.floor((ty - y_range[0]) / (y_range[1] - y_range[0]) * y_bins).astype(np.int64)
+    # The upper edge belongs to the last bin
+    return np.minimum(ix, x_bins - 1), np.minimum(iy, y_bins - 1)
+
+
+def hex_cells(tx, ty, x_range, y_range, x_bins, y_bins) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hexagonal cell of every point as doubled lattice coordinates: a cell
+    (i, j) is centred at `lo + i * step / 2` on each axis. Uses the two
+    offset rectangular lattices of matplotlib's `hexbin` and assigns
+    each point to the nearer centre.
+    """
+    sx = (tx - x_range[0]) / (x_range[1] - x_range[0]) * x_bins
+    sy = (ty - y_range[0]) / (y_range[1] - y_range[0]) * y_bins
+    i1, j1 = np.round(sx), np.round(sy)
+    i2, j2 = np.floor(sx), np.floor(sy)
+    d1 = (sx - i1) ** 2 + 3.0 * (sy - j1) ** 2
+    d2 = (sx - i2 - 0.5) ** 2 + 3.0 * (sy - j2 - 0.5) ** 2
+    first = d1 <= d2
+    ix = np.where(first, 2 * i1, 2 * i2 + 1).astype(np.int64)
+    iy = np.where(first, 2 * j1, 2 * j2 + 1).astype(np.int64)
+    return ix, iy
+
+
+def stratified_sample(cells: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Indices of up to `n` points spread over `cells` (small non-negative
+    cell keys) in proportion to the cell counts. Points are taken
+    round-robin by their random rank within their cell, so sparse cells
+    are represented before dense cells get a second point.
+    """
+    if n >= len(cells):
+        return np.arange(len(cells))
+    counts = np.bincount(cells)
+    quota = np.where(counts > 0, np.maximum(1, np.ceil(n * counts / len(cells))), 0)
+    # Thin every cell to about twice its quota with one uniform draw so
+    # only the candidates need sorting
+    u = rng.random(len(cells))
+    candidates = np.flatnonzero(u < (2 * quota / np.maximum(counts, 1))[cells])
+    order = candidates[np.lexsort((u[candidates], cells[candidates]))]
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    keep = rank < quota[sorted_cells]
+    chosen, rank = order[keep], rank[keep]
+    return chosen[np.argsort(rank, kind="stable")[:n]]
+
+
+def outlier_sample(tx: np.ndarray, ty: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the `n` points furthest from the median in IQR units."""
+
+    def robust(t):
+        q1, median, q3 = np.quantile(t, [0.25, 0.5, 0.75])
+        return np.abs(t - median) / (q3 - q1 if q3 > q1 else 1.0)
+
+    score = np.maximum(robust(tx), robust(ty))
+    if n < len(score):
+        top = np.argpartition(-score, n - 1)[:n]
+    else:
+        top = np.arange(len(score))
+    return top[np.argsort(-score[top], kind="stable")]
+
+
+def density(
+    x: np.ndarray,
+    y: np.ndarray,
+    traders: Callable[[Sequence[int]], List[str]],
+    kind: str = "grid",
+    x_bins: int = 50,
+    y_bins: int = 50,
+    x_scale: str = "linear",
+    y_scale: str = "linear",
+    clip: float = 0.0,
+    sample: int = 0,
+    sample_method: str = "stratified",
+    seed: int = 0,
+) -> FootprintDensityResponse:
+    """
+    Bin the finite (x, y) pairs and optionally sample individual points.
+    `traders` maps positions in `x`/`y` to trader ids and is only called
+    for sampled points.
+    """
+    finite = np.isfinite(x) & np.isfinite(y)
+    total = int(finite.sum())
+    x_axis = AxisTransform(x_scale, x[finite])
+    y_axis = AxisTransform(y_scale, y[finite])
+    usable = finite & x_axis.valid(x) & y_axis.valid(y)
+    positions = np.flatnonzero(usable)
+    tx = x_axis.forward(x[positions])
+    ty = y_axis.forward(y[positions])
+
+    x_range = _range(tx, clip)
+    y_range = _range(ty, clip)
+    inside = (tx >= x_range[0]) & (tx <= x_range[1]) & (ty >= y_range[0]) & (ty <= y_range[1])
+    cell_fn = hex_cells if kind == "hex" else grid_cells
+    ix, iy = cell_fn(tx[inside], ty[inside], x_range, y_range, x_bins, y_bins)
+
+    # Count occupied cells via a single combined key
+    width = 2 * x_bins + 2
+    cell_keys = iy * width + ix
+    counts = np.bincount(cell_keys)
+    keys = np.flatnonzero(counts)
+    counts = counts[keys]
+
+    points: List[FootprintPoint] = []
+    if sample > 0 and len(positions):
+        if sample_method == "outliers":
+            chosen = outlier_sample(tx, ty, sample)
+        else:
+            # Clipped points form one extra stratum (key 0)
+            cells = np.zeros(len(positions), dtype=np.int64)
+            cells[inside] = cell_keys + 1
+            chosen = stratified_sample(cells, sample, np.random.default_rng(seed))
+        ids = traders(positions[chosen])
+        points = [
+            FootprintPoint(trader=t, footprint=float(f), edge=float(e))
+            for t, f, e in zip(ids, x[positions[chosen]], y[positions[chosen]])
+        ]
+
+    def axis(transform: AxisTransform, lo: float, hi: float, bins: int) -> DensityAxis:
+        edges = transform.inverse(np.linspace(lo, hi, bins + 1))
+        return DensityAxis(
+            scale=transform.scale,
+            linthresh=transform.linthresh,
+            lo=float(edges[0]),
+            hi=float(edges[-1]),
+            step=(hi - lo) / bins,
+            edges=[float(e) for e in edges] if kind == "grid" else None,
+        )
+
+    return FootprintDensityResponse(
+        kind=kind,
+        total=total,
+        binned=int(inside.sum()),
+        clipped=int((~inside).sum()),
+        excluded=total - len(positions),
+        x=axis(x_axis, *x_range, x_bins),
+        y=axis(y_axis, *y_range, y_bins),
+        x_index=(keys % width).tolist(),
+        y_index=(keys // width).tolist(),
+        counts=counts.tolist(),
+        points=points,
+    )
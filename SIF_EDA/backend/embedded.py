@@ -0,0 +1,150 @@
+"""
+Async access to the embedded DuckDB backend.
+
+DuckDB runs inside the API process and has no asyncio driver, so the
+routers cannot use SQLAlchemy's `AsyncEngine` with it. The classes here
+offer the small part of the `AsyncEngine`/`AsyncSession` interface the
+backend uses (`connect`, `connection`, `execute`, `scalar`, `stream`,
+`run_sync`, `dispose`) on top of a synchronous SQLAlchemy engine, running every
+database call on a worker thread so the event loop never blocks on a
+query. `execute` buffers the whole result before returning, like
+`AsyncSession.execute`; `stream` fetches one partition per thread hop.
+
+Checkouts beyond the pool's capacity wait on a semaphore in the event
+loop rather than inside the pool: a checkout blocked on a worker thread
+would hold that thread while the connections it waits for need threads
+to finish their queries, and under load every thread ends up waiting.
+
+The API opens the database file read-only, so several workers can
+share it; DuckDB then refuses a writer, so stop the API while the ETL
+reloads the file.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from sqlalchemy import Connection, Engine, Row
+from sqlalchemy.engine import Result
+
+
+class EmbeddedStreamResult:
+    """Server-side cursor whose partitions are fetched on a worker thread."""
+
+    def __init__(self, result: Result):
+        self._result = result
+
+    async def partitions(self, size: int) -> AsyncIterator[List[Row]]:
+        while True:
+            rows = await asyncio.to_thread(self._result.fetchmany, size)
+            if not rows:
+                return
+            yield rows
+
+
+class EmbeddedConnection:
+    """An open connection of an `EmbeddedEngine`."""
+
+    def __init__(self, conn: Connection, slots: asyncio.Semaphore):
+        self.sync_connection = conn
+        self._slots = slots
+
+    @property
+    def dialect(self):
+        return self.sync_connection.dialect
+
+    def _execute(self, statement, params: Optional[Dict[str, Any]]) -> Result:
+        # Freezing fetches every row on the worker thread
+        return self.sync_connection.execute(statement, params or {}).freeze()()
+
+    async def execute(self, statement, params: Optional[Dict[str, Any]] = None) -> Result:
+        return await asyncio.to_thread(self._execute, statement, params)
+
+    async def scalar(self, statement, params: Optional[Dict[str, Any]] = None) -> Any:
+        return (await self.execute(statement, params)).scalar()
+
+    async def stream(self, statement, params: Optional[Dict[str, Any]] = None) -> EmbeddedStreamResult:
+        result = await asyncio.to_thread(
+            self.sync_connection.execution_options(stream_results=True).execute, statement, params or {}
+        )
+        return EmbeddedStreamResult(result)
+
+    async def run_sync(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call `fn(sync_connection, *args, **kwargs)` on a worker thread."""
+        return await asyncio.to_thread(fn, self.sync_connection, *args, **kwargs)
+
+    async def close(self) -> None:
+        try:
+            await asyncio.to_thread(self.sync_connection.close)
+        finally:
+            self._slots.release()
+
+
+class EmbeddedEngine:
+    """`AsyncEngine` stand-in over a synchronous engine."""
+
+    def __init__(self, sync_engine: Engine, max_connections: int):
+        self.sync_engine = sync_engine
+        self._slots = asyncio.Semaphore(max_connections)
+
+    @property
+    def dialect(self):
+        return self.sync_engine.dialect
+
+    async def _open(self) -> EmbeddedConnection:
+        await self._slots.acquire()
+        try:
+            return EmbeddedConnection(await asyncio.to_thread(self.sync_engine.connect), self._slots)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[EmbeddedConnection]:
+        conn = await self._open()
+        try:
+            yield conn
+        finally:
+            await conn.close()
+
+    def session(self) -> "EmbeddedSession":
+        return EmbeddedSession(self)
+
+    async def dispose(self) -> None:
+        await asyncio.to_thread(self.sync_engine.dispose)
+
+
+class EmbeddedSession:
+    """
+    `AsyncSession` stand-in for the routers: checks a connection out of
+    the engine's pool on first use and returns it on exit.
+    """
+
+    def __init__(self, engine: EmbeddedEngine):
+        self.engine = engine
+        self._conn: Optional[EmbeddedConnection] = None
+
+    async def __aenter__(self) -> "EmbeddedSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _connection(self) -> EmbeddedConnection:
+        if self._conn is None:
+            self._conn = await self.engine._open()
+        return self._conn
+
+    async def connection(self) -> EmbeddedConnection:
+        """The session's connection, like `AsyncSession.connection`."""
+        return await self._connection()
+
+    async def execute(self, statement, params: Optional[Dict[str, Any]] = None) -> Result:
+        return await (await self._connection()).execute(statement, params)
+
+    async def scalar(self, statement, params: Optional[Dict[str, Any]] = None) -> Any:
+        return await (await self._connection()).scalar(statement, params)
+
+    async def stream(self, statement, params: Optional[Dict[str, Any]] = None) -> EmbeddedStreamResult:
+        return await (await self._connection()).stream(statement, params)
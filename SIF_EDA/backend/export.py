@@ -0,0 +1,370 @@
+"""
+Columnar bulk export of the trader tables.
+
+`/export/{table}` streams `trader_agg`, `trader_stats` or
+`trader_topic_share` as Arrow record batches, encoded either as an Arrow
+IPC stream or as Parquet. Batches come from one of three sources, none
+of which builds a Python object per row:
+
+* a snapshot (see `snapshot.py`): columns are wrapped as Arrow arrays
+  in place. Trader ids are already laid out as Arrow's `large_string`
+  (int64 offsets into a UTF-8 blob) and numeric columns are float64, so
+  a trader range is a zero-copy slice; only filters that pick rows out
+  of the range cost a `take`;
+* Postgres: the query runs as `COPY (...) TO STDOUT (FORMAT csv)` and
+  Arrow's CSV parser turns each block of output into a batch with the
+  export schema;
+* embedded DuckDB: the query result is read as Arrow directly.
+
+Rows come in trader order ("C" collation), and topic shares in
+descending share order within a trader, so every source returns the
+same rows in the same order. Values are float64, except
+`transaction_count`, which is int32, and the text columns.
+"""
+import asyncio
+import io
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from .snapshot import AGG_COLUMNS, STATS_COLUMNS, Snapshot
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Media types accepted in `Accept`, by export format. Wildcards get the
+# Arrow stream.
+MEDIA_TYPE_FORMATS = {
+    ARROW_STREAM_MEDIA_TYPE: "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-arrow": "arrow",
+    PARQUET_MEDIA_TYPE: "parquet",
+    "application/x-parquet": "parquet",
+    "application/*": "arrow",
+    "*/*": "arrow",
+}
+FORMAT_MEDIA_TYPES = {"arrow": ARROW_STREAM_MEDIA_TYPE, "parquet": PARQUET_MEDIA_TYPE}
+FORMAT_EXTENSIONS = {"arrow": "arrows", "parquet": "parquet"}
+
+# Exportable columns of each table, in output order
+EXPORT_TABLES: Dict[str, List[str]] = {
+    "trader_agg": ["trader", "trader_label"] + AGG_COLUMNS,
+    "trader_stats": ["trader"] + STATS_COLUMNS,
+    "trader_topic_share": ["trader", "topic", "share"],
+}
+
+# Table aliases in the export SQL; filters on traders use `a`
+TABLE_ALIASES = {"trader_agg": "a", "trader_stats": "s", "trader_topic_share": "t"}
+
+TEXT_COLUMNS = {"trader", "trader_label", "topic"}
+INT_COLUMNS = {"transaction_count"}
+
+# Rows per batch from a snapshot or DuckDB
+BATCH_ROWS = 65536
+# Bytes of COPY output parsed into one batch
+COPY_BLOCK_BYTES = 4 << 20
+# COPY chunks buffered ahead of the encoder
+COPY_QUEUE_CHUNKS = 16
+
+
+def column_type(col: str) -> pa.DataType:
+    if col in TEXT_COLUMNS:
+        return pa.large_string()
+    if col in INT_COLUMNS:
+        return pa.int32()
+    return pa.float64()
+
+
+def export_schema(columns: List[str]) -> pa.Schema:
+    return pa.schema([(col, column_type(col)) for col in columns])
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """
+    Export format for an `Accept` header: the supported media type with
+    the highest q-value, the first one listed on ties. A missing header
+    gets the Arrow stream; None means nothing acceptable was offered.
+    """
+    if not accept:
+        return "arrow"
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        fmt = MEDIA_TYPE_FORMATS.get(media_type.lower())
+        if fmt is not None and q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def export_sql(
+    table: str,
+    columns: List[str],
+    label: Optional[str] = None,
+    prefix: Optional[str] = None,
+    min_volume: Optional[float] = None,
+    topic: Optional[str] = None,
+) -> Tuple[str, list]:
+    """
+    Build the export query for `table` with `$n` placeholders, which both
+    asyncpg and DuckDB accept, and its arguments. Trader filters join
+    `trader_agg` when exporting another table.
+    """
+    alias = TABLE_ALIASES[table]
+    select = []
+    for col in columns:
+        if col in TEXT_COLUMNS:
+            select.append(f"{alias}.{col}")
+        elif col in INT_COLUMNS:
+            select.append(f"{alias}.{col}::int4 AS {col}")
+        else:
+            select.append(f"{alias}.{col}::float8 AS {col}")
+    conditions, args = [], []
+
+    def bind(value) -> str:
+        args.append(value)
+        return f"${len(args)}"
+
+    if label is not None:
+        conditions.append(f"COALESCE(a.trader_label, 'Unknown') = {bind(label)}")
+    if prefix is not None:
+        conditions.append(f"starts_with(a.trader, {bind(prefix)})")
+    if min_volume is not None:
+        conditions.append(f"a.trader_volume >= {bind(min_volume)}")
+    if topic is not None:
+        conditions.append(f"t.topic = {bind(topic)}")
+    source = f"{table} {alias}"
+    if table != "trader_agg" and any(value is not None for value in (label, prefix, min_volume)):
+        source += f" JOIN trader_agg a ON a.trader = {alias}.trader"
+    order = f'{alias}.trader COLLATE "C"'
+    if table == "trader_topic_share":
+        order += ", t.share DESC, t.topic"
+    sql = f"SELECT {', '.join(select)} FROM {source}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql + f" ORDER BY {order}", args
+
+
+def _numeric(values: np.ndarray, col: str) -> pa.Array:
+    # NaN marks NULL in the snapshot; the data buffer is not copied
+    array = pa.array(values, from_pandas=True)
+    return pc.cast(array, pa.int32()) if col in INT_COLUMNS else array
+
+
+def snapshot_batches(
+    snapshot: Snapshot,
+    table: str,
+    columns: List[str],
+    label: Optional[str] = None,
+    prefix: Optional[str] = None,
+    min_volume: Optional[float] = None,
+    topic: Optional[str] = None,
+) -> Iterator[pa.RecordBatch]:
+    """Yield the export of `table` from the snapshot's arrays."""
+    schema = export_schema(columns)
+    traders = pa.LargeStringArray.from_buffers(
+        len(snapshot), pa.py_buffer(snapshot.traders.offsets), pa.py_buffer(snapshot.traders.data)
+    )
+    lo, hi = snapshot.traders.prefix_range(prefix) if prefix is not None else (0, len(snapshot))
+    # Trader rows in [lo, hi) that pass the filters, or None for all of them
+    rows = None
+    if label is not None or min_volume is not None:
+        keep = np.ones(hi - lo, dtype=bool)
+        if label is not None:
+            # Unlabelled traders (code -1) count as 'Unknown'
+            codes = [code for code, name in enumerate(snapshot.label_names) if name == label]
+            if label == "Unknown":
+                codes.append(-1)
+            keep &= np.isin(snapshot.label_codes[lo:hi], codes)
+        if min_volume is not None:
+            keep &= snapshot.columns["trader_volume"][lo:hi] >= min_volume
+        rows = lo + np.flatnonzero(keep)
+
+    if table != "trader_topic_share":
+        labels = pa.array(snapshot.label_names, type=pa.large_string())
+        n = hi - lo if rows is None else len(rows)
+        for start in range(0, n, BATCH_ROWS):
+            if rows is None:
+                stop = min(start + BATCH_ROWS, n)
+                picked = slice(lo + start, lo + stop)
+                trader_values = traders.slice(lo + start, stop - start)
+            else:
+                picked = rows[start:start + BATCH_ROWS]
+                trader_values = traders.take(pa.array(picked))
+            arrays = []
+            for col in columns:
+                if col == "trader":
+                    arrays.append(trader_values)
+                elif col == "trader_label":
+                    codes = snapshot.label_codes[picked]
+                    arrays.append(labels.take(pa.array(codes, mask=codes < 0)))
+                else:
+                    arrays.append(_numeric(snapshot.columns[col][picked], col))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+        return
+
+    # Topic shares: expand trader rows into their CSR entries
+    indptr = snapshot.topic_indptr
+    if rows is None:
+        entries = np.arange(indptr[lo], indptr[hi])
+        owners = np.repeat(np.arange(lo, hi), np.diff(indptr[lo:hi + 1]))
+    else:
+        counts = indptr[rows + 1] - indptr[rows]
+        owners = np.repeat(rows, counts)
+        entries = indptr[owners] + (np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts))
+    if topic is not None:
+        code = snapshot.topic_names.index(topic) if topic in snapshot.topic_names else -1
+        keep = snapshot.topic_indices[entries] == code
+        entries, owners = entries[keep], owners[keep]
+    topics = pa.array(snapshot.topic_names, type=pa.large_string())
+    for start in range(0, len(entries), BATCH_ROWS):
+        batch_entries = entries[start:start + BATCH_ROWS]
+        arrays = []
+        for col in columns:
+            if col == "trader":
+                arrays.append(traders.take(pa.array(owners[start:start + BATCH_ROWS])))
+            elif col == "topic":
+                arrays.append(topics.take(pa.array(snapshot.topic_indices[batch_entries])))
+            else:
+                arrays.append(_numeric(snapshot.topic_shares[batch_entries], col))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def postgres_batches(conn, sql: str, args: list, schema: pa.Schema) -> AsyncIterator[pa.RecordBatch]:
+    """
+    Yield the rows of `sql` from Postgres as batches, parsing the CSV
+    output of `COPY` with Arrow. `conn` is the request's `AsyncConnection`.
+    """
+    raw = (await conn.get_raw_connection()).driver_connection
+    queue: asyncio.Queue = asyncio.Queue(maxsize=COPY_QUEUE_CHUNKS)
+
+    async def copy() -> None:
+        try:
+            await raw.copy_from_query(sql, *args, output=queue.put, format="csv")
+        except Exception as exc:
+            await queue.put(exc)
+            return
+        await queue.put(None)
+
+    read_options = pa_csv.ReadOptions(column_names=schema.names, use_threads=False)
+    # COPY writes NULL unquoted and empty strings quoted
+    convert_options = pa_csv.ConvertOptions(
+        column_types=schema, null_values=[""], strings_can_be_null=True, quoted_strings_can_be_null=False
+    )
+
+    def parse(block: bytes) -> List[pa.RecordBatch]:
+        table = pa_csv.read_csv(
+            pa.py_buffer(block), read_options=read_options, convert_options=convert_options
+        )
+        return table.to_batches()
+
+    task = asyncio.create_task(copy())
+    try:
+        pending = bytearray()
+        while True:
+            chunk = await queue.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if chunk is not None:
+                pending += chunk
+                if len(pending) < COPY_BLOCK_BYTES:
+                    continue
+                # Parse whole lines; no exported text contains a newline
+                cut = pending.rindex(b"\n") + 1
+                block, pending = bytes(pending[:cut]), pending[cut:]
+            else:
+                block = bytes(pending)
+            if block:
+                for batch in await asyncio.to_thread(parse, block):
+                    yield batch
+            if chunk is None:
+                return
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def embedded_batches(conn, sql: str, args: list, schema: pa.Schema) -> AsyncIterator[pa.RecordBatch]:
+    """Yield the rows of `sql` from DuckDB, which returns Arrow natively."""
+
+    def open_reader(sync_conn):
+        result = sync_conn.connection.driver_connection.execute(sql, args)
+        if hasattr(result, "to_arrow_reader"):
+            return result.to_arrow_reader(BATCH_ROWS)
+        return result.fetch_record_batch(BATCH_ROWS)
+
+    def next_batch(reader) -> Optional[pa.RecordBatch]:
+        try:
+            return reader.read_next_batch()
+        except StopIteration:
+            return None
+
+    reader = await conn.run_sync(open_reader)
+    while (batch := await conn.run_sync(lambda _: next_batch(reader))) is not None:
+        yield pa.RecordBatch.from_arrays(
+            [pc.cast(column, field.type) for column, field in zip(batch.columns, schema)], schema=schema
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what an Arrow writer emits until drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def encode(
+    batches: AsyncIterator[pa.RecordBatch], schema: pa.Schema, fmt: str, compression: Optional[str]
+) -> AsyncIterator[bytes]:
+    """
+    Encode batches as an Arrow IPC stream or as Parquet (one row group
+    per batch), yielding the bytes written after each batch.
+    """
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression=compression or "none")
+    else:
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+    try:
+        async for batch in batches:
+            # Compression is CPU bound; keep it off the event loop
+            await asyncio.to_thread(writer.write_batch, batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+async def iterate(batches: Iterator[pa.RecordBatch]) -> AsyncIterator[pa.RecordBatch]:
+    """Adapt the synchronous snapshot batches to `encode`."""
+    for batch in batches:
+        yield batch
@@ -5,21 +5,87 @@ This module instantiates the FastAPI app and includes all routers
 defined in the `backend.routers` package. It also configures CORS to
 allow requests from any origin during development. Adjust the CORS
 settings as needed for production use.
+
+When `SNAPSHOT_DIR` or `SNAPSHOT_ENABLED` is set, the lifespan handler
+sets up a columnar snapshot of the trader tables (see `snapshot.py`)
+and the routers answer from it instead of querying the database.
+
+Successful JSON responses are cached per data generation by
+`ResponseCacheMiddleware` (see `cache.py`) and served with strong ETags.
+`MetricsMiddleware` (see `metrics.py`) records the latency of every
+request, cached or not, for `/metrics`.
 """
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from .cache import (
+    CACHE_GENERATION_TTL,
+    RESPONSE_CACHE_MB,
+    GenerationTracker,
+    ResponseCache,
+    ResponseCacheMiddleware,
+)
+from .database import engine
+from .metrics import MetricsMiddleware
+from .snapshot import (
+    SNAPSHOT_DIR,
+    SNAPSHOT_ENABLED,
+    SNAPSHOT_POLL_SECONDS,
+    SnapshotFileSource,
+    StaticSnapshotSource,
+    load_snapshot,
+)
+
 from .routers import (
     overview_router,
     labels_router,
     footprint_router,
     topics_router,
     archetypes_router,
+    distributions_router,
+    traders_router,
+    cache_router,
+    refresh_router,
+    metrics_router,
+    export_router,
 )
 
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.snapshots = None
+    if SNAPSHOT_DIR:
+        # Shared memory-mapped file published by the ETL
+        app.state.snapshots = SnapshotFileSource(SNAPSHOT_DIR, SNAPSHOT_POLL_SECONDS)
+        if app.state.snapshots.current() is None:
+            logger.warning("No snapshot in %s yet; serving from SQL", SNAPSHOT_DIR)
+    elif SNAPSHOT_ENABLED:
+        try:
+            app.state.snapshots = StaticSnapshotSource(await load_snapshot(engine))
+        except Exception:
+            # Keep serving from the database rather than failing startup
+            logger.exception("Could not load snapshot; falling back to SQL")
+    yield
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="Polymarket Trader Explorer API", version="0.1.0")
+    app = FastAPI(title="Polymarket Trader Explorer API", version="0.1.0", lifespan=lifespan)
+    app.state.response_cache = ResponseCache(int(RESPONSE_CACHE_MB * 1024 * 1024))
+    app.state.generations = GenerationTracker(engine, CACHE_GENERATION_TTL)
+    # Added before CORS so that CORS wraps it and cached replies get CORS headers
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        cache=app.state.response_cache,
+        generations=app.state.generations,
+    )
+    # Outside the cache so that cached replies are timed too
+    app.add_middleware(MetricsMiddleware)
     # Allow all origins for ease of development. In production you
     # should restrict origins to trusted domains.
     app.add_middleware(
@@ -35,6 +101,12 @@ def create_app() -> FastAPI:
     app.include_router(footprint_router)
     app.include_router(topics_router)
     app.include_router(archetypes_router)
+    app.include_router(distributions_router)
+    app.include_router(traders_router)
+    app.include_router(cache_router)
+    app.include_router(refresh_router)
+    app.include_router(metrics_router)
+    app.include_router(export_router)
     return app
 
 
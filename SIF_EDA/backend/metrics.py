@@ -0,0 +1,394 @@
+"""
+Latency and query metrics in the Prometheus text format.
+
+`MetricsMiddleware` times every HTTP request and records it in a
+histogram labelled with the method, the route template (e.g.
+`/traders/{trader_id}/profile`, so ids do not multiply the series) and
+the status code, read from the route FastAPI matched. Cached replies
+are included, so the histogram shows the latency clients see; the
+response cache stores the route with each entry for that.
+
+`instrument_engine` attaches SQLAlchemy cursor event hooks that time
+every statement and record its row count, labelled with the route of
+the request that ran it (`middleware` before routing, e.g. the response
+cache's generation check, and `background` outside requests) and the
+SQL verb. SQLAlchemy has no event that fires before a
+pool checkout, so checkout wait is measured by the engine's pool class
+instead (`TimedAsyncAdaptedQueuePool`, `TimedQueuePool`); it includes
+opening a new connection when the pool is not full yet.
+
+When `SLOW_QUERY_MS` is set, statements taking at least that many
+milliseconds are logged at WARNING with their bound parameters and
+counted in `sif_db_slow_statements_total`. Parameters can contain
+whatever clients searched for, so keep it off where logs are shared.
+
+`/metrics` renders `REGISTRY`. Like `/cache/stats`, the numbers are per
+worker process. Prometheus scrapes whichever worker answers, so run one
+worker, or scrape each one, when exact totals matter.
+
+`RunReport` records the duration and peak RSS of each ETL stage in a
+registry of its own. The ETL prints it at the end of the run and, with
+`--report`, writes it in the same text format, e.g. for node_exporter's
+textfile collector.
+"""
+import logging
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Log statements slower than this many milliseconds (0 disables the log)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram upper bounds, in seconds and in rows
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+UNMATCHED_ROUTE = "unmatched"
+BACKGROUND_ROUTE = "background"
+# Statements run by middleware before routing, e.g. the cache's generation check
+MIDDLEWARE_ROUTE = "middleware"
+
+# ASGI scope of the request being served, read by the statement hooks
+current_request: ContextVar[Optional[dict]] = ContextVar("current_request", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of series, one per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """(name suffix, formatted labels, value) of every sample."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples()]
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "", _format_labels(self.labels, key), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Cumulative histogram over fixed upper bounds, plus sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        names = self.labels + ("le",)
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", _format_labels(names, key + (_format_value(float(bound)),)), cumulative
+            yield "_sum", _format_labels(self.labels, key), total
+            yield "_count", _format_labels(self.labels, key), cumulative
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "sif_http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ["method", "route", "status"],
+)
+DB_STATEMENT_SECONDS = REGISTRY.histogram(
+    "sif_db_statement_duration_seconds",
+    "Execution time of SQL statements, by requesting route and SQL verb",
+    ["route", "operation"],
+)
+DB_STATEMENT_ROWS = REGISTRY.histogram(
+    "sif_db_statement_rows",
+    "Rows returned or affected per SQL statement, where the driver reports it",
+    ["route", "operation"],
+    ROW_BUCKETS,
+)
+DB_SLOW_STATEMENTS = REGISTRY.counter(
+    "sif_db_slow_statements_total",
+    "Statements slower than SLOW_QUERY_MS",
+    ["route", "operation"],
+)
+DB_POOL_CHECKOUT_SECONDS = REGISTRY.histogram(
+    "sif_db_pool_checkout_duration_seconds",
+    "Time spent waiting for a connection from the pool",
+)
+
+
+def route_label(scope: Optional[dict]) -> str:
+    """
+    Path template of the route that handled `scope`, which routing (or
+    a response cache replay) stores in `scope["route"]`.
+    """
+    if scope is None:
+        return BACKGROUND_ROUTE
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_request.set(scope)
+        status = 500
+        start = time.perf_counter()
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            current_request.reset(token)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=scope["method"], route=route_label(scope), status=str(status)
+            )
+
+
+_FIRST_WORD = re.compile(r"\s*(\w+)")
+
+
+def _operation(statement: str) -> str:
+    match = _FIRST_WORD.match(statement)
+    return match.group(1).upper() if match else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which a failed statement discards
+    if context is not None:
+        context.metrics_statement_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "metrics_statement_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    scope = current_request.get()
+    route = MIDDLEWARE_ROUTE if scope is not None and "route" not in scope else route_label(scope)
+    operation = _operation(statement)
+    DB_STATEMENT_SECONDS.observe(elapsed, route=route, operation=operation)
+    rows = getattr(cursor, "rowcount", -1)
+    if rows is not None and rows >= 0:
+        DB_STATEMENT_ROWS.observe(rows, route=route, operation=operation)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        DB_SLOW_STATEMENTS.inc(route=route, operation=operation)
+        logger.warning(
+            "Slow query (%.1f ms, route %s): %s; parameters: %r",
+            elapsed * 1000,
+            route,
+            " ".join(statement.split()),
+            parameters,
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record the timing and row count of every statement `engine` runs."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class _TimedCheckout:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """`AsyncAdaptedQueuePool` recording how long each checkout waits."""
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """`QueuePool` recording how long each checkout waits."""
+
+
+def peak_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+    """High-water mark of resident memory since the process started."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RunReport:
+    """
+    Duration and peak RSS of each stage of an ETL run. Peak RSS is the
+    process's high-water mark when the stage ended, so the stage that
+    raised it is the first one to report the higher value; CSV parse
+    workers are reported separately once they have exited.
+    """
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.stage_seconds = self.registry.gauge(
+            "sif_etl_stage_duration_seconds", "Wall time of each ETL stage", ["stage"]
+        )
+        self.stage_peak_rss = self.registry.gauge(
+            "sif_etl_stage_peak_rss_bytes", "Peak resident memory at the end of each ETL stage", ["stage", "process"]
+        )
+        self.finished = self.registry.gauge(
+            "sif_etl_run_finished_timestamp_seconds", "Unix time the ETL run finished"
+        )
+        self.stages: List[Tuple[str, float, Optional[int]]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as stage `name`."""
+        start = time.perf_counter()
+        yield
+        rss = peak_rss_bytes()
+        self.record(name, time.perf_counter() - start, rss)
+        workers = peak_rss_bytes(resource.RUSAGE_CHILDREN)
+        if workers:
+            self.stage_peak_rss.set(workers, stage=name, process="workers")
+
+    def record(self, name: str, seconds: float, peak_rss: Optional[int] = None) -> None:
+        """Add a stage timed elsewhere, e.g. a background view refresh."""
+        self.stages.append((name, seconds, peak_rss))
+        self.stage_seconds.set(seconds, stage=name)
+        if peak_rss is not None:
+            self.stage_peak_rss.set(peak_rss, stage=name, process="etl")
+
+    def summary(self) -> str:
+        width = max((len(name) for name, _, _ in self.stages), default=0)
+        lines = []
+        for name, seconds, peak_rss in self.stages:
+            rss = f"  peak RSS {peak_rss / (1 << 20):,.0f} MB" if peak_rss is not None else ""
+            lines.append(f"  {name:<{width}}  {seconds:8.2f}s{rss}")
+        return "\n".join(lines)
+
+    def write(self, path: str) -> None:
+        """Write the report in the Prometheus text format, atomically."""
+        self.finished.set(time.time())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.registry.render())
+        os.replace(tmp_path, path)
@@ -8,6 +8,12 @@ from .labels import router as labels_router
 from .footprint import router as footprint_router
 from .topics import router as topics_router
 from .archetypes import router as archetypes_router
+from .distributions import router as distributions_router
+from .traders import router as traders_router
+from .cache import router as cache_router
+from .refresh import router as refresh_router
+from .metrics import router as metrics_router
+from .export import router as export_router
 
 __all__ = [
     "overview_router",
@@ -15,4 +21,10 @@ __all__ = [
     "footprint_router",
     "topics_router",
     "archetypes_router",
+    "distributions_router",
+    "traders_router",
+    "cache_router",
+    "refresh_router",
+    "metrics_router",
+    "export_router",
 ]
\ No newline at end of file
@@ -1,50 +1,147 @@
 """
-Archetypes endpoint.
+Archetypes endpoints.
 
-This implementation provides a simple placeholder grouping of traders
-into archetypes based on their labels. Each unique label becomes an
-archetype containing all traders with that label. In future work you
-can replace this logic with clustering on behavioural features to
-identify more nuanced archetypes (e.g. momentum traders, event snipers).
+Archetypes are behavioural clusters fitted offline by the ETL with
+mini-batch k-means over standardised impact, pacing and topic features
+(see `backend/clustering.py`). The ETL writes the centroids to
+`archetype_centroid` and every trader's assignment to
+`trader_archetype`, so these endpoints only look them up.
+
+`/archetypes/map` returns the archetypes with their member counts and
+centroids. Members are listed separately by
+`/archetypes/{id}/members`, one page at a time in trader order: pass
+the `next_cursor` of a page as `cursor` to get the next one. Pages are
+read through the `(archetype_id, trader)` index, so the cost of a
+request depends on `limit` rather than on the size of the archetype.
+With `format=ndjson` every member after `cursor` is streamed as one
+JSON object per line instead, in chunks, for bulk export.
 """
-from typing import List
-from fastapi import APIRouter, Depends
+import json
+from typing import Iterable, List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from ..database import get_db
-from ..schemas import ArchetypesResponse, ArchetypeItem
+from ..schemas import ArchetypeItem, ArchetypeMember, ArchetypeMembersResponse, ArchetypesResponse
+from ..snapshot import Snapshot, get_snapshot
 
 router = APIRouter(prefix="/archetypes", tags=["archetypes"])
 
+# Largest page accepted by `/archetypes/{id}/members`
+MAX_MEMBERS_PAGE = 10000
+
+# Members fetched and serialized at a time by the NDJSON stream
+STREAM_CHUNK = 5000
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 
 @router.get("/map", response_model=ArchetypesResponse)
-async def get_archetypes(db: AsyncSession = Depends(get_db)) -> ArchetypesResponse:
+async def get_archetypes(
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> ArchetypesResponse:
     """
-    Return a list of archetypes derived from trader labels. Each
-    archetype contains the list of trader identifiers belonging to that
-    label. If no labels exist the result is empty.
+    Return the behavioural archetypes in id order (largest first) with
+    their member counts and centroids in standardised feature units. If
+    the clustering stage has not run the result is empty.
     """
+    if snapshot is not None:
+        return snapshot.archetypes
     result = await db.execute(
         text(
             """
-            SELECT COALESCE(trader_label, 'Unknown') AS label,
-                   ARRAY_AGG(trader) AS members
-            FROM trader_agg
-            GROUP BY COALESCE(trader_label, 'Unknown')
-            ORDER BY label
+            SELECT archetype_id, name, member_count, features, centroid
+            FROM archetype_centroid
+            ORDER BY archetype_id
             """
         )
     )
     archetypes: List[ArchetypeItem] = []
-    idx = 1
     for r in result:
         archetypes.append(
             ArchetypeItem(
-                id=idx,
-                name=r.label,
-                members=r.members,
+                id=r.archetype_id,
+                name=r.name,
+                member_count=r.member_count,
+                centroid=dict(zip(r.features, r.centroid)),
             )
         )
-        idx += 1
-    return ArchetypesResponse(archetypes=archetypes)
\ No newline at end of file
+    return ArchetypesResponse(archetypes=archetypes)
+
+
+def _ndjson(members: Iterable[Tuple[str, float]]) -> bytes:
+    return "".join(
+        json.dumps({"trader": trader, "distance": float(distance)}) + "\n" for trader, distance in members
+    ).encode("utf-8")
+
+
+def _members_sql(cursor: Optional[str], limit: bool) -> str:
+    # Two separate statements rather than `:cursor IS NULL OR ...`, which
+    # the planner cannot turn into an index range
+    after = 'AND trader COLLATE "C" > :cursor' if cursor is not None else ""
+    return f"""
+        SELECT trader, distance
+        FROM trader_archetype
+        WHERE archetype_id = :archetype_id {after}
+        ORDER BY trader COLLATE "C"
+        {"LIMIT :limit" if limit else ""}
+    """
+
+
+@router.get("/{archetype_id}/members", response_model=ArchetypeMembersResponse)
+async def get_archetype_members(
+    archetype_id: int = Path(..., ge=1, description="Archetype identifier"),
+    cursor: Optional[str] = Query(None, description="Return members after this trader (a page's next_cursor)"),
+    limit: int = Query(1000, ge=1, le=MAX_MEMBERS_PAGE, description="Maximum number of members per page"),
+    format: Literal["json", "ndjson"] = Query(
+        "json", description="`ndjson` streams every member after cursor, ignoring limit"
+    ),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+):
+    """
+    Return the members of an archetype in trader order with their
+    distance to the centroid, one page at a time, or stream them all as
+    NDJSON. Returns 404 if the archetype does not exist.
+    """
+    if snapshot is not None:
+        if format == "ndjson":
+            chunks = snapshot.archetype_member_chunks(archetype_id, cursor, STREAM_CHUNK)
+            if chunks is None:
+                raise HTTPException(status_code=404, detail="Archetype not found")
+            return StreamingResponse((_ndjson(chunk) for chunk in chunks), media_type=NDJSON_MEDIA_TYPE)
+        response = snapshot.archetype_members(archetype_id, cursor, limit)
+        if response is None:
+            raise HTTPException(status_code=404, detail="Archetype not found")
+        return response
+
+    exists = await db.execute(
+        text("SELECT 1 FROM archetype_centroid WHERE archetype_id = :archetype_id"),
+        {"archetype_id": archetype_id},
+    )
+    if exists.first() is None:
+        raise HTTPException(status_code=404, detail="Archetype not found")
+    params = {"archetype_id": archetype_id, "cursor": cursor}
+    if format == "ndjson":
+
+        async def stream():
+            # Server-side cursor: only one chunk is held in memory
+            result = await db.stream(text(_members_sql(cursor, limit=False)), params)
+            async for rows in result.partitions(STREAM_CHUNK):
+                yield _ndjson(rows)
+
+        return StreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE)
+
+    # Fetch one extra row to tell whether there is a next page
+    result = await db.execute(text(_members_sql(cursor, limit=True)), {**params, "limit": limit + 1})
+    rows = result.all()
+    members = [ArchetypeMember(trader=r.trader, distance=float(r.distance)) for r in rows[:limit]]
+    return ArchetypeMembersResponse(
+        archetype_id=archetype_id,
+        members=members,
+        next_cursor=members[-1].trader if len(rows) > limit else None,
+    )
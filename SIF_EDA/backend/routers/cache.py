@@ -0,0 +1,30 @@
+"""
+Response cache monitoring endpoint.
+
+`/cache/stats` reports the size of this worker's response cache, its
+hit, miss, 304 and eviction counters and the data generation the cache
+is currently keyed on. Counters are per process.
+"""
+from fastapi import APIRouter, Request
+
+from ..schemas import CacheStatsResponse
+
+router = APIRouter(prefix="/cache", tags=["cache"])
+
+
+@router.get("/stats", response_model=CacheStatsResponse)
+async def get_cache_stats(request: Request) -> CacheStatsResponse:
+    """Return the response cache counters for this worker."""
+    cache = request.app.state.response_cache
+    generations = request.app.state.generations
+    return CacheStatsResponse(
+        enabled=cache.enabled,
+        generation=await generations.current(request.app),
+        entries=len(cache),
+        size_bytes=cache.size_bytes,
+        max_bytes=cache.max_bytes,
+        hits=cache.hits,
+        misses=cache.misses,
+        not_modified=cache.not_modified,
+        evictions=cache.evictions,
+    )
@@ -0,0 +1,86 @@
+"""
+Distribution endpoints.
+
+`/distributions/{column}` describes the distribution of a numeric
+`trader_agg` column over all traders or one `label`: exact count, min,
+max and mean, approximate percentiles, a trimmed mean and a histogram
+over fixed log10 bins of |value| on each side of zero. The ETL builds a
+mergeable quantile sketch and log histogram per column and label in
+`trader_distribution` (see `backend/sketches.py`), so a request reads a
+few hundred stored numbers whatever the number of traders; the
+all-traders figures merge the per-label sketches.
+"""
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+
+from ..database import get_db
+from ..schemas import DistributionResponse
+from ..sketches import BINS_PER_DECADE, DEFAULT_PERCENTILES, HISTOGRAM_RESOLUTIONS, Distribution, describe
+from ..snapshot import AGG_COLUMNS, Snapshot, get_snapshot
+
+router = APIRouter(prefix="/distributions", tags=["distributions"])
+
+
+async def fetch_distributions(column: str, db: AsyncSession, snapshot: Optional[Snapshot]) -> Dict[str, Distribution]:
+    """Stored distributions of `column` keyed by label."""
+    if snapshot is not None:
+        return snapshot.distributions.get(column, {})
+    result = await db.execute(
+        text(
+            """
+            SELECT trader_label, count, nulls, min_value, max_value, total,
+                   sketch_values, sketch_weights, histogram, histogram_sums
+            FROM trader_distribution
+            WHERE column_name = :column
+            """
+        ),
+        {"column": column},
+    )
+    return {
+        r.trader_label: Distribution(
+            count=r.count,
+            nulls=r.nulls,
+            minimum=r.min_value,
+            maximum=r.max_value,
+            total=r.total,
+            values=r.sketch_values,
+            weights=r.sketch_weights,
+            histogram=r.histogram,
+            histogram_sums=r.histogram_sums,
+        )
+        for r in result
+    }
+
+
+@router.get("/{column}", response_model=DistributionResponse)
+async def get_distribution(
+    column: str = Path(..., description="Numeric trader_agg column, e.g. trader_pnl"),
+    label: Optional[str] = Query(None, description="Trader label ('Unknown' for unlabelled); all traders if omitted"),
+    percentile: List[float] = Query(
+        DEFAULT_PERCENTILES, description="Percentiles (0-100) to report; repeat the parameter for each"
+    ),
+    trim: float = Query(0.05, ge=0, lt=0.5, description="Fraction cut from each tail for the trimmed mean"),
+    bins_per_decade: int = Query(
+        BINS_PER_DECADE, description=f"Histogram bins per decade of |value|, one of {HISTOGRAM_RESOLUTIONS}"
+    ),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> DistributionResponse:
+    """
+    Return the distribution summary of a column. Returns 404 for an
+    unknown column or label.
+    """
+    if column not in AGG_COLUMNS:
+        raise HTTPException(status_code=404, detail="Unknown column")
+    if any(not 0 <= p <= 100 for p in percentile):
+        raise HTTPException(status_code=422, detail="Percentiles must be between 0 and 100")
+    if bins_per_decade not in HISTOGRAM_RESOLUTIONS:
+        raise HTTPException(status_code=422, detail=f"bins_per_decade must be one of {HISTOGRAM_RESOLUTIONS}")
+    distributions = await fetch_distributions(column, db, snapshot)
+    response = describe(column, label, distributions, percentile, trim, bins_per_decade)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Label not found")
+    return response
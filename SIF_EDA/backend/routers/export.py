@@ -0,0 +1,91 @@
+"""
+Bulk export endpoints.
+
+`/export/{table}` streams `trader_agg`, `trader_stats` or
+`trader_topic_share` in a columnar format for notebooks, instead of one
+JSON object per row. The `Accept` header picks the format: an Arrow IPC
+stream (`application/vnd.apache.arrow.stream`, also the default) or
+Parquet (`application/vnd.apache.parquet`); `format=` overrides it.
+Batches are compressed with zstd unless `compression=` says otherwise.
+
+`columns=` selects columns (comma-separated, default all), and `label`,
+`prefix` (trader id) and `min_volume` filter traders in every table;
+`topic` filters topic shares. Batches are built from the snapshot when
+one is served and from a database cursor otherwise (see `export.py`).
+"""
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db
+from ..export import (
+    EXPORT_TABLES,
+    FORMAT_EXTENSIONS,
+    FORMAT_MEDIA_TYPES,
+    embedded_batches,
+    encode,
+    export_schema,
+    export_sql,
+    iterate,
+    negotiate_format,
+    postgres_batches,
+    snapshot_batches,
+)
+from ..snapshot import Snapshot, get_snapshot
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+@router.get("/{table}", response_class=StreamingResponse)
+async def export_table(
+    request: Request,
+    table: Literal["trader_agg", "trader_stats", "trader_topic_share"] = Path(..., description="Table to export"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to export (default all)"),
+    label: Optional[str] = Query(None, description="Only traders with this label ('Unknown' for unlabelled)"),
+    prefix: Optional[str] = Query(None, min_length=1, description="Only traders whose id starts with this"),
+    min_volume: Optional[float] = Query(None, description="Only traders with at least this volume"),
+    topic: Optional[str] = Query(None, description="Only shares of this topic (trader_topic_share)"),
+    format: Optional[Literal["arrow", "parquet"]] = Query(None, description="Overrides the Accept header"),
+    compression: Literal["zstd", "lz4", "none"] = Query("zstd", description="Batch or column chunk compression"),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> StreamingResponse:
+    """
+    Stream the selected columns of the traders passing the filters as an
+    Arrow IPC stream or Parquet file. Returns 406 if the `Accept` header
+    allows neither and 422 for unknown columns.
+    """
+    fmt = format or negotiate_format(request.headers.get("accept"))
+    if fmt is None:
+        raise HTTPException(status_code=406, detail=f"Acceptable types: {', '.join(FORMAT_MEDIA_TYPES.values())}")
+    available = EXPORT_TABLES[table]
+    selected = [col.strip() for col in columns.split(",") if col.strip()] if columns else available
+    unknown = [col for col in selected if col not in available]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown columns {unknown}; {table} has {', '.join(available)}"
+        )
+    if topic is not None and table != "trader_topic_share":
+        raise HTTPException(status_code=422, detail="topic only filters trader_topic_share")
+
+    schema = export_schema(selected)
+    filters = dict(label=label, prefix=prefix, min_volume=min_volume, topic=topic)
+    if snapshot is not None:
+        batches = iterate(snapshot_batches(snapshot, table, selected, **filters))
+    else:
+        sql, args = export_sql(table, selected, **filters)
+        conn = await db.connection()
+        if conn.dialect.name == "duckdb":
+            batches = embedded_batches(conn, sql, args, schema)
+        else:
+            batches = postgres_batches(conn, sql, args, schema)
+    return StreamingResponse(
+        encode(batches, schema, fmt, None if compression == "none" else compression),
+        media_type=FORMAT_MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{table}.{FORMAT_EXTENSIONS[fmt]}"',
+            "Vary": "Accept",
+        },
+    )
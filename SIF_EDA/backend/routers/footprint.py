@@ -5,24 +5,41 @@ Returns a list of traders along with a chosen footprint metric and an
 edge metric. Footprint is proxied by `price_levels_per_volume` and
 edge is proxied by ROI. The results can be used to draw a scatter
 plot showing how market impact relates to profitability.
+
+Points are the traders with the largest |PnL|, read in rank order from
+the `trader_top_pnl` materialized view built by the ETL, so the cost of
+a request depends on `limit` rather than on the number of traders.
+
+`/footprint/density` covers every trader instead: it returns a 2D
+histogram or hexbin grid of the same two metrics, optionally with a
+stratified or outlier-preserving sample of individual points (see
+`density.py`).
 """
-from typing import List
+from typing import List, Literal, Optional
+
+import numpy as np
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 
 from ..database import get_db
-from ..schemas import FootprintPoint, FootprintScatterResponse
+from ..density import density
+from ..schemas import FootprintDensityResponse, FootprintPoint, FootprintScatterResponse
+from ..snapshot import MAX_FOOTPRINT_POINTS, Snapshot, get_snapshot
 
 router = APIRouter(prefix="/footprint", tags=["footprint"])
 
 
 @router.get("/scatter", response_model=FootprintScatterResponse)
 async def get_footprint_scatter(
-    limit: int = Query(500, ge=10, le=5000, description="Maximum number of points to return"),
+    limit: int = Query(500, ge=10, le=MAX_FOOTPRINT_POINTS, description="Maximum number of points to return"),
     db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
 ) -> FootprintScatterResponse:
     """Return a list of (footprint, edge) points for scatter plotting."""
+    if snapshot is not None:
+        return snapshot.footprint_scatter(limit)
     result = await db.execute(
         text(
             """
@@ -30,10 +47,9 @@ async def get_footprint_scatter(
                 trader,
                 price_levels_per_volume AS footprint,
                 roi                    AS edge
-            FROM trader_agg
-            WHERE price_levels_per_volume IS NOT NULL
-              AND roi IS NOT NULL
-            ORDER BY ABS(trader_pnl) DESC
+            FROM trader_top_pnl
+            WHERE board = 'footprint'
+            ORDER BY rank
             LIMIT :limit
             """
         ),
@@ -48,4 +64,65 @@ async def get_footprint_scatter(
                 edge=float(r.edge),
             )
         )
-    return FootprintScatterResponse(points=points)
\ No newline at end of file
+    return FootprintScatterResponse(points=points)
+
+@router.get("/density", response_model=FootprintDensityResponse)
+async def get_footprint_density(
+    kind: Literal["grid", "hex"] = Query("grid", description="Rectangular grid or hexagonal bins"),
+    bins: int = Query(50, ge=2, le=200, description="Number of bins along the footprint axis"),
+    bins_y: Optional[int] = Query(None, ge=2, le=200, description="Number of bins along the edge axis (defaults to bins)"),
+    x_scale: Literal["linear", "log", "symlog"] = Query("linear", description="Footprint axis scale"),
+    y_scale: Literal["linear", "log", "symlog"] = Query("linear", description="Edge axis scale"),
+    clip: float = Query(0.0, ge=0.0, lt=0.5, description="Bin between the clip and 1 - clip quantiles"),
+    sample: int = Query(0, ge=0, le=MAX_FOOTPRINT_POINTS, description="Number of individual points to include"),
+    sample_method: Literal["stratified", "outliers"] = Query("stratified", description="How to pick sampled points"),
+    seed: int = Query(0, description="Seed for stratified sampling"),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> FootprintDensityResponse:
+    """Return binned (footprint, edge) counts over all traders."""
+    if snapshot is not None:
+        x = snapshot.columns["price_levels_per_volume"]
+        y = snapshot.columns["roi"]
+        traders = snapshot.traders.take
+    else:
+        # One array per column, so no row object is built per trader.
+        # Aggregates over the same rows see them in the same order, and
+        # trader ids are only read when points are sampled.
+        result = await db.execute(
+            text(
+                f"""
+                SELECT
+                    array_agg(price_levels_per_volume::float8) AS footprint,
+                    array_agg(roi::float8)                     AS edge
+                    {", array_agg(trader) AS trader" if sample > 0 else ""}
+                FROM trader_agg
+                WHERE price_levels_per_volume IS NOT NULL
+                  AND roi IS NOT NULL
+                """
+            )
+        )
+        row = result.one()
+        x = np.array(row.footprint or [], dtype=np.float64)
+        y = np.array(row.edge or [], dtype=np.float64)
+        ids = row.trader if sample > 0 else None
+
+        def traders(indices):
+            return [ids[i] for i in indices]
+
+    # Binning is CPU bound; keep it off the event loop
+    return await run_in_threadpool(
+        density,
+        x,
+        y,
+        traders,
+        kind=kind,
+        x_bins=bins,
+        y_bins=bins_y or bins,
+        x_scale=x_scale,
+        y_scale=y_scale,
+        clip=clip,
+        sample=sample,
+        sample_method=sample_method,
+        seed=seed,
+    )
@@ -6,20 +6,26 @@ label. It reports the number of traders, average profit per volume
 (PPV), mean ROI and standard deviation of ROI. This helps evaluate
 whether certain labels correspond to superior or inferior performance.
 """
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from ..database import get_db
 from ..schemas import LabelSummaryItem, LabelSummaryResponse
+from ..snapshot import Snapshot, get_snapshot
 
 router = APIRouter(prefix="/labels", tags=["labels"])
 
 
 @router.get("/summary", response_model=LabelSummaryResponse)
-async def get_label_summary(db: AsyncSession = Depends(get_db)) -> LabelSummaryResponse:
+async def get_label_summary(
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> LabelSummaryResponse:
     """Return aggregated PPV and ROI statistics by trader label."""
+    if snapshot is not None:
+        return snapshot.label_summary
     result = await db.execute(
         text(
             """
@@ -0,0 +1,19 @@
+"""
+Prometheus metrics endpoint.
+
+`/metrics` returns this worker's request latency histograms per route,
+SQL statement durations and row counts per route and verb, pool checkout
+waits and slow-statement counts in the Prometheus text format (see
+`backend/metrics.py`). Counters are per process.
+"""
+from fastapi import APIRouter, Response
+
+from ..metrics import METRICS_CONTENT_TYPE, REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=Response)
+async def get_metrics() -> Response:
+    """Return all metrics of this worker in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
@@ -2,34 +2,38 @@
 Overview endpoints.
 
 Provides a summary of the dataset: total counts, sums and a list of top
-traders by absolute profit. The endpoint is deliberately simple and
-should return quickly even on large datasets.
+traders by absolute profit. Both are precomputed by the ETL in the
+`trader_rollup` and `trader_top_pnl` materialized views, so a request
+reads one row plus the first ten ranked rows regardless of dataset
+size. When a snapshot is loaded the same rollup is read from it.
 """
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from ..database import get_db
 from ..schemas import TraderSummary, OverviewResponse
+from ..snapshot import Snapshot, get_snapshot
 
 
 router = APIRouter(prefix="/overview", tags=["overview"])
 
 
 @router.get("/", response_model=OverviewResponse)
-async def get_overview(db: AsyncSession = Depends(get_db)) -> OverviewResponse:
+async def get_overview(
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> OverviewResponse:
     """Return top level metrics and a list of top traders by PnL."""
-    # Aggregate totals and average ROI
+    if snapshot is not None:
+        return snapshot.overview
+    # Precomputed totals and average ROI
     result = await db.execute(
         text(
             """
-            SELECT
-                COUNT(*)                            AS total_traders,
-                COALESCE(SUM(trader_volume), 0)     AS total_volume,
-                COALESCE(SUM(trader_pnl), 0)        AS total_pnl,
-                AVG(roi)                            AS average_roi
-            FROM trader_agg
+            SELECT total_traders, total_volume, total_pnl, average_roi
+            FROM trader_rollup
             """
         )
     )
@@ -39,13 +43,14 @@ async def get_overview(db: AsyncSession = Depends(get_db)) -> OverviewResponse:
     total_pnl = float(row.total_pnl or 0)
     average_roi = float(row.average_roi) if row.average_roi is not None else None
 
-    # Fetch top 10 traders by absolute profit
+    # Top 10 traders by absolute profit from the precomputed ranking
     top_result = await db.execute(
         text(
             """
             SELECT trader, trader_pnl, roi, trader_volume, trader_label
-            FROM trader_agg
-            ORDER BY ABS(trader_pnl) DESC
+            FROM trader_top_pnl
+            WHERE board = 'all'
+            ORDER BY rank
             LIMIT 10
             """
         )
@@ -0,0 +1,45 @@
+"""
+Materialized view refresh monitoring endpoint.
+
+`/refresh/status` reports the latest refresh of every materialized view
+recorded in `matview_refresh_log` by `backend/refresh.py`: whether it is
+still running, when it started and finished, how long it took and how
+many rows the view holds. Views are refreshed concurrently, so the other
+endpoints keep answering from the previous contents meanwhile.
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+
+from ..database import get_db
+from ..schemas import RefreshStatusResponse, ViewRefreshStatus
+
+router = APIRouter(prefix="/refresh", tags=["refresh"])
+
+
+@router.get("/status", response_model=RefreshStatusResponse)
+async def get_refresh_status(db: AsyncSession = Depends(get_db)) -> RefreshStatusResponse:
+    """Return the latest refresh of each materialized view."""
+    result = await db.execute(
+        text(
+            """
+            SELECT DISTINCT ON (view_name)
+                   view_name, status, started_at, finished_at, seconds, row_count, error
+            FROM matview_refresh_log
+            ORDER BY view_name, id DESC
+            """
+        )
+    )
+    views = [
+        ViewRefreshStatus(
+            view=r.view_name,
+            status=r.status,
+            started_at=r.started_at,
+            finished_at=r.finished_at,
+            seconds=r.seconds,
+            row_count=r.row_count,
+            error=r.error,
+        )
+        for r in result
+    ]
+    return RefreshStatusResponse(refreshing=any(v.status == "running" for v in views), views=views)
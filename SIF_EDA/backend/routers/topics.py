@@ -1,71 +1,151 @@
 """
-Topic exploration endpoint.
+Topic exploration endpoints.
 
 For a given trader, return their topic distribution along with entropy
 and niche score metrics. If the trader is not found the endpoint
-returns a 404 error.
+returns a 404 error. `/topics/traders` does the same for many traders
+at once (for example everyone in the overview's top list) and returns
+the profiles keyed by trader, listing unknown ids under `missing`.
+
+Both routes share one query, which fetches the existence check, the
+metrics and the ordered topic shares of every requested trader in a
+single round-trip.
+
+`/topics/similar/{trader_id}` returns the traders whose topic mix and
+impact/pacing z-scores are closest by cosine similarity, from the LSH
+index stored in the snapshot (see `similarity.py`). It needs a snapshot
+(`SNAPSHOT_DIR` or `SNAPSHOT_ENABLED`) and answers 503 without one.
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Path
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 
 from ..database import get_db
-from ..schemas import TopicShare, TraderTopicResponse
+from ..schemas import (
+    SimilarTradersResponse,
+    TopicShare,
+    TraderTopicProfile,
+    TraderTopicResponse,
+    TraderTopicsResponse,
+)
+from ..snapshot import Snapshot, get_snapshot
 
 router = APIRouter(prefix="/topics", tags=["topics"])
 
+# Largest number of traders accepted by `/topics/traders`
+MAX_BATCH_TRADERS = 200
+
+# Largest `k` accepted by `/topics/similar`
+MAX_SIMILAR_TRADERS = 100
+
+
+async def fetch_topic_profiles(
+    trader_ids: Sequence[str], db: AsyncSession, snapshot: Optional[Snapshot]
+) -> Dict[str, TraderTopicProfile]:
+    """Topic distribution and metrics of each known trader in `trader_ids`."""
+    if snapshot is not None:
+        return snapshot.topic_profiles(trader_ids)
+    result = await db.execute(
+        text(
+            """
+            SELECT a.trader,
+                   m.active_topics,
+                   m.topic_entropy::float8 AS topic_entropy,
+                   m.niche_score::float8 AS niche_score,
+                   t.topics,
+                   t.shares
+            FROM trader_agg a
+            LEFT JOIN trader_topic_metrics m USING (trader)
+            LEFT JOIN (
+                -- Filtered before grouping, so that engines which
+                -- decorrelate a LATERAL join (DuckDB) do not aggregate
+                -- every trader's shares
+                SELECT ts.trader,
+                       array_agg(ts.topic ORDER BY ts.share DESC, ts.topic) AS topics,
+                       array_agg(ts.share::float8 ORDER BY ts.share DESC, ts.topic) AS shares
+                FROM trader_topic_share ts
+                WHERE ts.trader = ANY(:traders)
+                GROUP BY ts.trader
+            ) t USING (trader)
+            WHERE a.trader = ANY(:traders)
+            """
+        ),
+        {"traders": list(trader_ids)},
+    )
+    profiles: Dict[str, TraderTopicProfile] = {}
+    for r in result:
+        topics = [TopicShare(topic=t, share=float(s)) for t, s in zip(r.topics or [], r.shares or [])]
+        if r.active_topics is None:
+            # Trader exists but has no topic info; return zeros
+            profiles[r.trader] = TraderTopicProfile(
+                active_topics=0, topic_entropy=0.0, niche_score=1.0, topic_shares=topics
+            )
+        else:
+            profiles[r.trader] = TraderTopicProfile(
+                active_topics=r.active_topics,
+                topic_entropy=float(r.topic_entropy),
+                niche_score=float(r.niche_score),
+                topic_shares=topics,
+            )
+    return profiles
+
 
 @router.get("/trader/{trader_id}", response_model=TraderTopicResponse)
 async def get_trader_topics(
     trader_id: str = Path(..., description="Trader identifier"),
     db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
 ) -> TraderTopicResponse:
     """Return the topic distribution and metrics for a specific trader."""
-    # Fetch topic shares
-    topic_result = await db.execute(
-        text(
-            """
-            SELECT topic, share
-            FROM trader_topic_share
-            WHERE trader = :trader
-            ORDER BY share DESC
-            """
-        ),
-        {"trader": trader_id},
-    )
-    topics = [TopicShare(topic=r.topic, share=float(r.share)) for r in topic_result]
-    # Fetch entropy and niche score
-    metrics_result = await db.execute(
-        text(
-            """
-            SELECT topic_entropy, niche_score, active_topics
-            FROM trader_topic_metrics
-            WHERE trader = :trader
-            """
-        ),
-        {"trader": trader_id},
+    profiles = await fetch_topic_profiles([trader_id], db, snapshot)
+    if trader_id not in profiles:
+        raise HTTPException(status_code=404, detail="Trader not found")
+    return TraderTopicResponse(trader=trader_id, **profiles[trader_id].model_dump())
+
+
+@router.get("/traders", response_model=TraderTopicsResponse)
+async def get_traders_topics(
+    trader: List[str] = Query(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_TRADERS,
+        description="Trader identifiers; repeat the parameter for each trader",
+    ),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> TraderTopicsResponse:
+    """
+    Return the topic distribution and metrics of many traders, keyed by
+    trader in request order. Unknown traders are listed in `missing`.
+    """
+    trader_ids = list(dict.fromkeys(trader))
+    profiles = await fetch_topic_profiles(trader_ids, db, snapshot)
+    return TraderTopicsResponse(
+        traders={t: profiles[t] for t in trader_ids if t in profiles},
+        missing=[t for t in trader_ids if t not in profiles],
     )
-    metrics_row = metrics_result.first()
-    if metrics_row is None:
-        # If no entry in trader_topic_metrics, check if trader exists at all
-        check = await db.execute(
-            text("SELECT 1 FROM trader_agg WHERE trader = :trader"), {"trader": trader_id}
-        )
-        if check.first() is None:
-            raise HTTPException(status_code=404, detail="Trader not found")
-        # Trader exists but has no topic info; return zeros
-        return TraderTopicResponse(
-            trader=trader_id,
-            active_topics=0,
-            topic_entropy=0.0,
-            niche_score=1.0,
-            topic_shares=topics,
+
+
+@router.get("/similar/{trader_id}", response_model=SimilarTradersResponse)
+async def get_similar_traders(
+    trader_id: str = Path(..., description="Trader identifier"),
+    k: int = Query(10, ge=1, le=MAX_SIMILAR_TRADERS, description="Number of neighbours to return"),
+    exact: bool = Query(False, description="Compare against every trader instead of using the index"),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> SimilarTradersResponse:
+    """
+    Return the `k` traders most similar to a trader in descending order
+    of cosine similarity. Returns 404 if the trader is not found.
+    """
+    if snapshot is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Similarity search needs a snapshot; set SNAPSHOT_DIR or SNAPSHOT_ENABLED",
         )
-    return TraderTopicResponse(
-        trader=trader_id,
-        active_topics=metrics_row.active_topics,
-        topic_entropy=float(metrics_row.topic_entropy),
-        niche_score=float(metrics_row.niche_score),
-        topic_shares=topics,
-    )
\ No newline at end of file
+    response = await run_in_threadpool(snapshot.similar_traders, trader_id, k, exact)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Trader not found")
+    return response
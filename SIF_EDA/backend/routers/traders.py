@@ -0,0 +1,315 @@
+"""
+Per-trader endpoints.
+
+`/traders/` is a leaderboard: traders ordered by one of the
+`LEADERBOARD_KEYS` (for example `roi` or `abs_pnl`), optionally
+filtered by label, a range of the sort key and a minimum volume.
+Traders without a value for the key are left out. Pages are keyset
+paginated: pass a page's `next_cursor` as `cursor` to continue after
+its last row. Every key has a partial index on (key, trader) that
+matches the `ORDER BY`, so any page is an index range scan of `limit`
+rows, however deep it is. With a snapshot the same pages come from a
+sorted order of each key computed on first use.
+
+`/traders/search?prefix=0xab` autocompletes trader ids: the traders
+whose id starts with `prefix`, largest volume first. With a snapshot
+the matches are a range of the sorted trader column found by binary
+search; in SQL `trader LIKE 'prefix%'` is a range scan of the
+`text_pattern_ops` index on `trader_agg.trader`.
+
+`/traders/{id}/profile` returns where a trader sits on every numeric
+column of `trader_agg` and `trader_stats`: its value, its rank (how
+many traders have a strictly smaller value) and the matching
+`percent_rank()` percentile. With a snapshot the ranks are precomputed
+when the snapshot is built (one int32 row per trader, see
+`snapshot.py`) and the trader is found through a hash index, so a
+request costs O(#metrics). Without one, a single scan of the joined
+tables counts the traders below the requested one on every column at
+once, rather than running a window function per column.
+"""
+import math
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Literal, Optional, Tuple, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+
+from ..database import get_db
+from ..schemas import (
+    LeaderboardEntry,
+    LeaderboardResponse,
+    TraderProfileResponse,
+    TraderSearchResponse,
+    TraderSummary,
+)
+from ..snapshot import (
+    AGG_COLUMNS,
+    LEADERBOARD_KEYS,
+    RANK_COLUMNS,
+    Snapshot,
+    decode_cursor,
+    encode_cursor,
+    get_snapshot,
+    metric_rank,
+)
+
+router = APIRouter(prefix="/traders", tags=["traders"])
+
+# Largest page accepted by `/traders/`
+MAX_LEADERBOARD_PAGE = 1000
+
+# Most matches returned by `/traders/search`
+MAX_SEARCH_RESULTS = 100
+
+# Leaderboard columns stored as integers rather than numeric
+INTEGER_COLUMNS = {"transaction_count"}
+
+
+def _column(col: str, agg: str, stats: str) -> str:
+    return f"{agg if col in AGG_COLUMNS else stats}.{col}"
+
+
+# Comparisons stay in the columns' own types: casting every row to
+# float8 for each metric would dominate the scan
+PROFILE_SQL = (
+    "SELECT t.trader, t.trader_label,\n"
+    + ",\n".join(
+        [f"t.{col}::float8 AS {col}" for col in RANK_COLUMNS]
+        + [
+            f"count(*) FILTER (WHERE {_column(col, 'x', 'y')} < t.{col}) AS {col}_rank,\n"
+            f"count({_column(col, 'x', 'y')}) AS {col}_count"
+            for col in RANK_COLUMNS
+        ]
+    )
+    + """
+FROM (
+    SELECT * FROM trader_agg a LEFT JOIN trader_stats s USING (trader) WHERE a.trader = :trader
+) t
+CROSS JOIN trader_agg x
+LEFT JOIN trader_stats y ON y.trader = x.trader
+GROUP BY t.trader, t.trader_label, """
+    + ", ".join(f"t.{col}" for col in RANK_COLUMNS)
+)
+
+
+def _sort_expression(key: str) -> Tuple[str, str, str]:
+    """SQL expression of a leaderboard key, the column it reads and the trader column of that table."""
+    column, absolute = LEADERBOARD_KEYS[key]
+    alias = "a" if column in AGG_COLUMNS else "s"
+    ref = f"{alias}.{column}"
+    return (f"abs({ref})" if absolute else ref), ref, f"{alias}.trader"
+
+
+def _bound(key: str, value: Union[Decimal, str], round_up: bool) -> Union[Decimal, int]:
+    """
+    A value to compare a leaderboard key with, in the column's own type
+    so that the comparison can use its index. Integer columns round
+    range bounds towards the inside of the range.
+    """
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid number {value!r}")
+    if not value.is_finite():
+        raise ValueError(f"Invalid number {value!r}")
+    if LEADERBOARD_KEYS[key][0] in INTEGER_COLUMNS:
+        return math.ceil(value) if round_up else math.floor(value)
+    return value
+
+
+async def fetch_leaderboard(
+    key: str,
+    descending: bool,
+    label: Optional[str],
+    min_value: Optional[Decimal],
+    max_value: Optional[Decimal],
+    min_volume: Optional[Decimal],
+    cursor: Optional[Tuple[str, str]],
+    limit: int,
+    db: AsyncSession,
+) -> LeaderboardResponse:
+    """One leaderboard page from SQL; see `Snapshot.leaderboard`."""
+    expression, ref, trader = _sort_expression(key)
+    conditions = [f"{ref} IS NOT NULL"]
+    params: Dict = {"limit": limit + 1}
+    if label is not None:
+        conditions.append("COALESCE(a.trader_label, 'Unknown') = :label")
+        params["label"] = label
+    if min_value is not None:
+        conditions.append(f"{expression} >= :min_value")
+        params["min_value"] = _bound(key, min_value, round_up=True)
+    if max_value is not None:
+        conditions.append(f"{expression} <= :max_value")
+        params["max_value"] = _bound(key, max_value, round_up=False)
+    if min_volume is not None:
+        conditions.append("a.trader_volume >= :min_volume")
+        params["min_volume"] = min_volume
+    if cursor is not None:
+        # A row comparison, which the index scan can start from directly
+        comparison = "<" if descending else ">"
+        conditions.append(
+            f'({expression}, {trader} COLLATE "C") {comparison} (:cursor_value, :cursor_trader)'
+        )
+        params["cursor_value"] = _bound(key, cursor[0], round_up=not descending)
+        params["cursor_trader"] = cursor[1]
+    direction = "DESC" if descending else "ASC"
+    join = "JOIN trader_stats s USING (trader)" if ref.startswith("s.") else ""
+    result = await db.execute(
+        text(
+            f"""
+            SELECT a.trader, a.trader_label,
+                   {expression}::float8 AS value,
+                   ({expression})::text AS cursor_value,
+                   a.trader_pnl::float8 AS pnl,
+                   a.roi::float8 AS roi,
+                   a.trader_volume::float8 AS volume
+            FROM trader_agg a {join}
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {expression} {direction}, {trader} COLLATE "C" {direction}
+            LIMIT :limit
+            """
+        ),
+        params,
+    )
+    rows = result.all()
+    entries: List[LeaderboardEntry] = [
+        LeaderboardEntry(
+            trader=r.trader,
+            label=r.trader_label,
+            value=r.value,
+            pnl=r.pnl,
+            roi=r.roi,
+            volume=r.volume,
+        )
+        for r in rows[:limit]
+    ]
+    last = rows[limit - 1] if len(rows) > limit else None
+    return LeaderboardResponse(
+        sort=key,
+        order=direction.lower(),
+        traders=entries,
+        next_cursor=encode_cursor(last.cursor_value, last.trader) if last is not None else None,
+    )
+
+
+@router.get("/", response_model=LeaderboardResponse)
+async def get_leaderboard(
+    sort: str = Query("abs_pnl", description=f"Sort key, one of {', '.join(LEADERBOARD_KEYS)}"),
+    order: Literal["asc", "desc"] = Query("desc", description="Sort direction"),
+    label: Optional[str] = Query(None, description="Only traders with this label ('Unknown' for unlabelled)"),
+    min_value: Optional[Decimal] = Query(None, description="Only traders whose sort key is at least this"),
+    max_value: Optional[Decimal] = Query(None, description="Only traders whose sort key is at most this"),
+    min_volume: Optional[Decimal] = Query(None, description="Only traders with at least this volume"),
+    cursor: Optional[str] = Query(None, description="Return traders after this cursor (a page's next_cursor)"),
+    limit: int = Query(50, ge=1, le=MAX_LEADERBOARD_PAGE, description="Maximum number of traders per page"),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> LeaderboardResponse:
+    """
+    Return one page of traders ordered by `sort`, ties broken by trader
+    id. Returns 422 for an unknown sort key or a malformed cursor.
+    """
+    if sort not in LEADERBOARD_KEYS:
+        raise HTTPException(status_code=422, detail=f"sort must be one of {', '.join(LEADERBOARD_KEYS)}")
+    for bound in (min_value, max_value, min_volume):
+        if bound is not None and not bound.is_finite():
+            raise HTTPException(status_code=422, detail="Range bounds must be finite numbers")
+    try:
+        position = decode_cursor(cursor) if cursor is not None else None
+        if position is not None:
+            _bound(sort, position[0], round_up=False)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    descending = order == "desc"
+    if snapshot is not None:
+        return snapshot.leaderboard(
+            sort,
+            descending,
+            label,
+            None if min_value is None else float(min_value),
+            None if max_value is None else float(max_value),
+            None if min_volume is None else float(min_volume),
+            None if position is None else (float(position[0]), position[1]),
+            limit,
+        )
+    return await fetch_leaderboard(sort, descending, label, min_value, max_value, min_volume, position, limit, db)
+
+
+def _like_prefix(prefix: str) -> str:
+    """LIKE pattern matching strings that start with `prefix` literally."""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+@router.get("/search", response_model=TraderSearchResponse)
+async def search_traders(
+    prefix: str = Query(..., min_length=1, description="Start of a trader id (case-insensitive)"),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS, description="Maximum number of traders to return"),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> TraderSearchResponse:
+    """
+    Return the traders whose id starts with `prefix`, largest volume
+    first and ties in trader order. The ETL lowercases trader ids, so
+    the prefix is lowercased too and a pasted EIP-55 checksummed address
+    still matches.
+    """
+    prefix = prefix.lower()
+    if snapshot is not None:
+        return snapshot.search(prefix, limit)
+    result = await db.execute(
+        text(
+            """
+            SELECT trader, trader_label, trader_pnl, roi, trader_volume
+            FROM trader_agg
+            WHERE trader LIKE :pattern
+            ORDER BY trader_volume DESC NULLS LAST, trader COLLATE "C"
+            LIMIT :limit
+            """
+        ),
+        {"pattern": _like_prefix(prefix), "limit": limit},
+    )
+    return TraderSearchResponse(
+        prefix=prefix,
+        traders=[
+            TraderSummary(
+                trader=r.trader,
+                pnl=float(r.trader_pnl) if r.trader_pnl is not None else 0.0,
+                roi=float(r.roi) if r.roi is not None else None,
+                volume=float(r.trader_volume) if r.trader_volume is not None else None,
+                label=r.trader_label,
+            )
+            for r in result
+        ],
+    )
+
+
+@router.get("/{trader_id}/profile", response_model=TraderProfileResponse)
+async def get_trader_profile(
+    trader_id: str = Path(..., description="Trader identifier"),
+    db: AsyncSession = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+) -> TraderProfileResponse:
+    """
+    Return a trader's value, rank and percentile on every numeric
+    metric. Metrics the trader has no value for have a null rank.
+    Returns 404 if the trader is not found.
+    """
+    if snapshot is not None:
+        profile = snapshot.trader_profile(trader_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail="Trader not found")
+        return profile
+    result = await db.execute(text(PROFILE_SQL), {"trader": trader_id})
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Trader not found")
+    r = row._mapping
+    return TraderProfileResponse(
+        trader=r["trader"],
+        label=r["trader_label"],
+        metrics=[
+            metric_rank(col, r[col], r[f"{col}_rank"], r[f"{col}_count"]) for col in RANK_COLUMNS
+        ],
+    )
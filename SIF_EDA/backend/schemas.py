@@ -6,7 +6,8 @@ automatically generate OpenAPI documentation. These models are kept
 minimal to avoid coupling the API too tightly to the underlying database
 schema; additional fields can be added later as needed.
 """
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -48,6 +49,89 @@ class FootprintScatterResponse(BaseModel):
     points: List[FootprintPoint]
 
 
+class DensityAxis(BaseModel):
+    scale: str
+    linthresh: Optional[float]
+    lo: float
+    hi: float
+    step: float
+    edges: Optional[List[float]]
+
+
+class FootprintDensityResponse(BaseModel):
+    kind: str
+    total: int
+    binned: int
+    clipped: int
+    excluded: int
+    x: DensityAxis
+    y: DensityAxis
+    x_index: List[int]
+    y_index: List[int]
+    counts: List[int]
+    points: List[FootprintPoint]
+
+
+class DistributionPercentile(BaseModel):
+    percentile: float
+    value: Optional[float]
+
+
+class LogHistogram(BaseModel):
+    bins_per_decade: int
+    edges: List[float]
+    counts: List[int]
+
+
+class DistributionResponse(BaseModel):
+    column: str
+    label: Optional[str]
+    count: int
+    nulls: int
+    min: Optional[float]
+    max: Optional[float]
+    mean: Optional[float]
+    trim: float
+    trimmed_mean: Optional[float]
+    percentiles: List[DistributionPercentile]
+    histogram: LogHistogram
+
+
+class MetricRank(BaseModel):
+    metric: str
+    value: Optional[float]
+    rank: Optional[int]
+    count: int
+    percentile: Optional[float]
+
+
+class TraderProfileResponse(BaseModel):
+    trader: str
+    label: Optional[str]
+    metrics: List[MetricRank]
+
+
+class TraderSearchResponse(BaseModel):
+    prefix: str
+    traders: List[TraderSummary]
+
+
+class LeaderboardEntry(BaseModel):
+    trader: str
+    label: Optional[str]
+    value: float
+    pnl: Optional[float]
+    roi: Optional[float]
+    volume: Optional[float]
+
+
+class LeaderboardResponse(BaseModel):
+    sort: str
+    order: str
+    traders: List[LeaderboardEntry]
+    next_cursor: Optional[str]
+
+
 class TopicShare(BaseModel):
     topic: str
     share: float
@@ -61,11 +145,74 @@ class TraderTopicResponse(BaseModel):
     topic_shares: List[TopicShare]
 
 
+class TraderTopicProfile(BaseModel):
+    active_topics: int
+    topic_entropy: float
+    niche_score: float
+    topic_shares: List[TopicShare]
+
+
+class TraderTopicsResponse(BaseModel):
+    traders: Dict[str, TraderTopicProfile]
+    missing: List[str]
+
+
+class SimilarTrader(BaseModel):
+    trader: str
+    similarity: float
+
+
+class SimilarTradersResponse(BaseModel):
+    trader: str
+    exact: bool
+    compared: int
+    neighbours: List[SimilarTrader]
+
+
 class ArchetypeItem(BaseModel):
     id: int
     name: str
-    members: List[str]
+    member_count: int
+    centroid: Dict[str, float]
 
 
 class ArchetypesResponse(BaseModel):
-    archetypes: List[ArchetypeItem]
\ No newline at end of file
+    archetypes: List[ArchetypeItem]
+
+
+class ArchetypeMember(BaseModel):
+    trader: str
+    distance: float
+
+
+class ArchetypeMembersResponse(BaseModel):
+    archetype_id: int
+    members: List[ArchetypeMember]
+    next_cursor: Optional[str]
+
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool
+    generation: Optional[int]
+    entries: int
+    size_bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    not_modified: int
+    evictions: int
+
+
+class ViewRefreshStatus(BaseModel):
+    view: str
+    status: str
+    started_at: datetime
+    finished_at: Optional[datetime]
+    seconds: Optional[float]
+    row_count: Optional[int]
+    error: Optional[str]
+
+
+class RefreshStatusResponse(BaseModel):
+    refreshing: bool
+    views: List[ViewRefreshStatus]
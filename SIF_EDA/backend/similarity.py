@@ -0,0 +1,184 @@
+"""
+Approximate nearest-neighbour search for "similar traders".
+
+Every trader is embedded as a unit float32 vector with two blocks:
+
+* topic: the trader's topic shares over the topic vocabulary, scaled to
+  unit length and weighted by `sqrt(TOPIC_WEIGHT)`
+* behaviour: the impact and pacing z-scores of `trader_stats`
+  (`BEHAVIOUR_FEATURES`), clipped to +/- `CLIP`, scaled to unit length
+  and weighted by `sqrt(1 - TOPIC_WEIGHT)`
+
+so the cosine similarity of two traders is the weighted mean of their
+topic and behaviour cosines. Traders with neither block get a zero
+vector and are never returned.
+
+The index is random-projection LSH (SimHash) arranged as an LSH
+Forest: each of `N_TABLES` tables hashes a vector to the signs of its
+projection on `TABLE_BITS` random hyperplanes and stores the row
+indices sorted by that code, so every prefix of a code is a contiguous
+bucket. A query takes the longest prefix whose buckets together hold
+about `CANDIDATES * k` entries per table, which adapts the bucket size
+to the local density of traders, and re-ranks the union by exact
+cosine. Only a few thousand vectors are touched per query however many
+traders there are. `exact=True` scans every vector instead, which is
+the reference for recall checks; so do small datasets (`EXACT_BELOW`).
+
+The vectors and tables are built with the snapshot (see `snapshot.py`)
+and stored alongside it, so with `SNAPSHOT_DIR` the ETL builds them
+once and every worker maps them read-only.
+"""
+from functools import cached_property
+from typing import Tuple
+
+import numpy as np
+
+BEHAVIOUR_FEATURES = ["z_plpt", "z_plpv", "z_plvwt", "z_std_time_vw"]
+
+# Share of the similarity carried by the topic block
+TOPIC_WEIGHT = 0.5
+
+# Standardised feature values are clipped to this magnitude
+CLIP = 5.0
+
+N_TABLES = 8
+TABLE_BITS = 16
+CODE_MAX = (1 << TABLE_BITS) - 1
+SEED = 0
+
+# Bucket entries gathered per table for each neighbour requested
+CANDIDATES = 10
+
+# Below this many traders a full scan is about as fast as the index
+EXACT_BELOW = 50000
+
+
+def random_planes(dim: int, seed: int = SEED) -> np.ndarray:
+    """The (N_TABLES * TABLE_BITS, dim) hyperplanes used by `hash_codes`."""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((N_TABLES * TABLE_BITS, dim)).astype(np.float32)
+
+
+def _unit_rows(block: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    return np.divide(block, norms, out=np.zeros_like(block), where=norms > 0)
+
+
+def trader_vectors(
+    n_topics: int,
+    topic_counts: np.ndarray,
+    topic_codes: np.ndarray,
+    topic_shares: np.ndarray,
+    features: np.ndarray,
+) -> np.ndarray:
+    """
+    Embed a chunk of traders. Topics are given in CSR form (entries per
+    trader, topic codes and shares); codes >= `n_topics` are ignored.
+    `features` holds `BEHAVIOUR_FEATURES` with NaN for missing values.
+    """
+    n = len(topic_counts)
+    topics = np.zeros((n, n_topics), dtype=np.float64)
+    rows = np.repeat(np.arange(n), topic_counts)
+    known = topic_codes < n_topics
+    np.add.at(topics, (rows[known], topic_codes[known]), topic_shares[known])
+    behaviour = np.clip(np.nan_to_num(features, nan=0.0), -CLIP, CLIP)
+    vectors = np.hstack(
+        [
+            np.sqrt(TOPIC_WEIGHT) * _unit_rows(topics),
+            np.sqrt(1 - TOPIC_WEIGHT) * _unit_rows(behaviour),
+        ]
+    )
+    # Renormalise traders that only have one of the two blocks
+    return _unit_rows(vectors).astype(np.float32)
+
+
+def hash_codes(vectors: np.ndarray, planes: np.ndarray) -> np.ndarray:
+    """(n, N_TABLES) uint16 SimHash codes, most significant bit first."""
+    bits = (vectors @ planes.T >= 0).reshape(len(vectors), N_TABLES, TABLE_BITS)
+    weights = (1 << np.arange(TABLE_BITS - 1, -1, -1)).astype(np.uint32)
+    return (bits.astype(np.uint32) @ weights).astype(np.uint16)
+
+
+def sort_tables(codes: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sort `rows` by their code in every table. Returns (N_TABLES, n)
+    arrays of sorted codes and int32 row indices.
+    """
+    order = np.argsort(codes, axis=0, kind="stable").T
+    return np.take_along_axis(codes.T, order, axis=1), rows[order].astype(np.int32)
+
+
+class SimilarityIndex:
+    """
+    LSH tables over trader vectors. `vectors` rows align with the
+    snapshot's traders; `codes` and `order` are the output of
+    `sort_tables` over the rows with a non-zero vector.
+    """
+
+    def __init__(self, vectors: np.ndarray, planes: np.ndarray, codes: np.ndarray, order: np.ndarray):
+        self.vectors = vectors
+        self.planes = planes
+        self.codes = codes
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @cached_property
+    def _indexed(self) -> np.ndarray:
+        indexed = np.zeros(len(self), dtype=bool)
+        indexed[self.order[0]] = True
+        return indexed
+
+    def candidates(self, vector: np.ndarray, target: int) -> np.ndarray:
+        """
+        Rows whose codes share the longest prefix with `vector`'s codes,
+        shortening the prefix in all tables at once until the buckets
+        hold at least `target` entries (LSH Forest, Bawa et al. 2005).
+        """
+        codes = hash_codes(vector[None, :], self.planes)[0].astype(np.int64)
+        shifts = np.arange(TABLE_BITS + 1)
+        lo = np.empty((N_TABLES, len(shifts)), dtype=np.int64)
+        hi = np.empty_like(lo)
+        for table, code in enumerate(codes):
+            prefix = (code >> shifts) << shifts
+            upper = prefix + (1 << shifts)
+            # Search with uint16 keys so NumPy does not upcast the table
+            lo[table] = np.searchsorted(self.codes[table], prefix.astype(np.uint16))
+            hi[table] = np.where(
+                upper > CODE_MAX,
+                len(self.codes[table]),
+                np.searchsorted(self.codes[table], np.minimum(upper, CODE_MAX).astype(np.uint16)),
+            )
+        # Shortest shift (longest prefix) whose buckets reach the target
+        sizes = (hi - lo).sum(axis=0)
+        shift = int(np.argmax(sizes >= target)) if sizes[-1] >= target else TABLE_BITS
+        found = [self.order[table, lo[table, shift]:hi[table, shift]] for table in range(N_TABLES)]
+        return np.unique(np.concatenate(found))
+
+    def query(self, row: int, k: int, exact: bool = False) -> Tuple[np.ndarray, np.ndarray, int, bool]:
+        """
+        The `k` rows most similar to `row` (excluding it) in descending
+        order of cosine similarity, their similarities, the number of
+        vectors compared and whether every vector was compared.
+        """
+        exact = exact or len(self) < EXACT_BELOW
+        vector = np.asarray(self.vectors[row], dtype=np.float32)
+        if not self._indexed[row]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), 0, exact
+        if exact:
+            sims = self.vectors @ vector
+            rows = np.flatnonzero(self._indexed)
+            sims = sims[rows]
+        else:
+            rows = self.candidates(vector, N_TABLES * CANDIDATES * k)
+            sims = self.vectors[rows] @ vector
+        compared = len(rows)
+        keep = rows != row
+        rows, sims = rows[keep], sims[keep]
+        if k < len(rows):
+            top = np.argpartition(-sims, k - 1)[:k]
+            rows, sims = rows[top], sims[top]
+        # Ties are broken by row, i.e. by trader id
+        ranked = np.lexsort((rows, -sims))
+        return rows[ranked], sims[ranked], compared, exact
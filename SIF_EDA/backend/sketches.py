@@ -0,0 +1,325 @@
+"""
+Mergeable summaries of heavy-tailed trader metrics.
+
+PnL, volume and most per-trader rates span many orders of magnitude,
+with a few whales in the tails, so linear histograms and plain means
+say little about the typical trader. For every numeric column of
+`trader_agg` and every `trader_label` the ETL streams the table once
+and keeps:
+
+* the exact count, number of NULLs, min, max and sum
+* a KLL quantile sketch (Karnin, Lang & Liberty 2016): a stack of
+  compactors where level h holds items of weight 2**h. When a level
+  outgrows its capacity it is sorted and every other item, from a
+  random offset, is promoted to the next level. Capacities shrink
+  geometrically below the top level, so a sketch holds about 3 * `K`
+  items however many values it has seen, and the rank error of any
+  quantile is around 1% for `K = 200`.
+* the count and sum of the values in each fixed signed log10 bin:
+  `BINS_PER_DECADE` bins per decade of |v| from 10**MIN_EXPONENT to
+  10**MAX_EXPONENT on each side of zero, plus one bin for
+  |v| < 10**MIN_EXPONENT. The outermost bins also take anything beyond
+  10**MAX_EXPONENT.
+
+Counts and histograms merge by addition and KLL sketches by
+concatenating their levels and compacting, so the ETL stores one row
+per (column, label) in `trader_distribution` and the all-traders
+distribution is the merge of the label rows. Percentiles come from the
+sketch. Trimmed means come from the histogram: ranks are exact there,
+and only the two bins at the trim points are taken at their mean,
+which matters in the tails where a sketch item stands for thousands of
+very different values. Neither depends on the number of traders.
+
+Compaction is seeded, so a given load and request always give the same
+answer.
+"""
+from functools import cached_property
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas import DistributionPercentile, DistributionResponse, LogHistogram
+
+# Capacity of the top compactor of a KLL sketch
+K = 200
+CAPACITY_DECAY = 2 / 3
+MIN_CAPACITY = 8
+SEED = 0
+
+BINS_PER_DECADE = 10
+MIN_EXPONENT = -6
+MAX_EXPONENT = 12
+# Bins per sign; the bin for |v| < 10**MIN_EXPONENT sits between them
+N_MAGNITUDE_BINS = (MAX_EXPONENT - MIN_EXPONENT) * BINS_PER_DECADE
+N_BINS = 2 * N_MAGNITUDE_BINS + 1
+
+# Coarser histograms must group whole bins within each decade
+HISTOGRAM_RESOLUTIONS = [1, 2, 5, 10]
+
+DEFAULT_PERCENTILES = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+
+
+class KLLSketch:
+    """Mergeable quantile sketch; `levels[h]` holds items of weight 2**h."""
+
+    def __init__(self, levels: Optional[List[np.ndarray]] = None, seed: int = SEED):
+        self.levels = levels or [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_items(cls, values: np.ndarray, weights: np.ndarray, seed: int = SEED) -> "KLLSketch":
+        """Rebuild a sketch from the output of `items`."""
+        heights = np.log2(weights).astype(np.int64) if len(weights) else np.zeros(0, dtype=np.int64)
+        n_levels = int(heights.max()) + 1 if len(heights) else 1
+        return cls([values[heights == h] for h in range(n_levels)], seed)
+
+    def capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(MIN_CAPACITY, int(np.ceil(K * CAPACITY_DECAY ** depth)))
+
+    def update(self, values: np.ndarray) -> None:
+        """Add a chunk of values (without NaNs)."""
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        for h, items in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+
+    def _compress(self) -> None:
+        # Adding a level lowers the capacity of every level below it, so
+        # keep compacting the lowest overflowing level until none is left
+        while True:
+            over = [h for h, items in enumerate(self.levels) if len(items) > self.capacity(h)]
+            if not over:
+                return
+            self._compact(over[0])
+
+    def _compact(self, h: int) -> None:
+        if h + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        items = np.sort(self.levels[h])
+        # With an odd number of items the smallest one stays behind
+        odd = len(items) % 2
+        promoted = items[odd + int(self.rng.integers(2))::2]
+        self.levels[h] = items[:odd]
+        self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Every retained item and its weight."""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(items), 1 << h, dtype=np.int64) for h, items in enumerate(self.levels)]
+        )
+        return values, weights
+
+
+def bin_index(values: np.ndarray) -> np.ndarray:
+    """Fixed log-histogram bin of each (non-NaN) value."""
+    magnitude = np.abs(values)
+    exponent = np.log10(np.maximum(magnitude, 10.0 ** MIN_EXPONENT))
+    offset = np.floor((exponent - MIN_EXPONENT) * BINS_PER_DECADE)
+    offset = np.clip(offset, 0, N_MAGNITUDE_BINS - 1).astype(np.int64)
+    index = N_MAGNITUDE_BINS + np.sign(values).astype(np.int64) * (offset + 1)
+    index[magnitude < 10.0 ** MIN_EXPONENT] = N_MAGNITUDE_BINS
+    return index
+
+
+def bin_edges(bins_per_decade: int = BINS_PER_DECADE) -> np.ndarray:
+    """Edges of the histogram bins at `bins_per_decade`, from most negative."""
+    n = (MAX_EXPONENT - MIN_EXPONENT) * bins_per_decade
+    positive = 10.0 ** (MIN_EXPONENT + np.arange(n + 1) / bins_per_decade)
+    # Round off the representation error of 10**(i / bins_per_decade)
+    positive = np.array([float(f"{edge:.12g}") for edge in positive])
+    return np.concatenate([-positive[::-1], positive])
+
+
+def coarsen(histogram: np.ndarray, bins_per_decade: int) -> np.ndarray:
+    """Sum groups of adjacent bins so that each decade has `bins_per_decade` bins."""
+    factor = BINS_PER_DECADE // bins_per_decade
+    return np.concatenate(
+        [
+            histogram[:N_MAGNITUDE_BINS].reshape(-1, factor).sum(axis=1),
+            histogram[N_MAGNITUDE_BINS:N_MAGNITUDE_BINS + 1],
+            histogram[N_MAGNITUDE_BINS + 1:].reshape(-1, factor).sum(axis=1),
+        ]
+    )
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+class Distribution:
+    """
+    Summary of one column over a group of traders. `values` and
+    `weights` are the items of its KLL sketch; `histogram` and
+    `histogram_sums` hold the count and sum of the values in each of
+    the `N_BINS` bins. `minimum` and `maximum` are NaN when `count` is 0.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        nulls: int,
+        minimum: Optional[float],
+        maximum: Optional[float],
+        total: float,
+        values: np.ndarray,
+        weights: np.ndarray,
+        histogram: np.ndarray,
+        histogram_sums: np.ndarray,
+    ):
+        self.count = int(count)
+        self.nulls = int(nulls)
+        self.minimum = np.nan if minimum is None else float(minimum)
+        self.maximum = np.nan if maximum is None else float(maximum)
+        self.total = float(total)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.int64)
+        self.histogram = np.asarray(histogram, dtype=np.int64)
+        self.histogram_sums = np.asarray(histogram_sums, dtype=np.float64)
+
+    @classmethod
+    def merge(cls, parts: Sequence["Distribution"]) -> "Distribution":
+        sketch = KLLSketch()
+        for part in parts:
+            sketch.merge(KLLSketch.from_items(part.values, part.weights))
+        values, weights = sketch.items()
+        present = [part for part in parts if part.count]
+        return cls(
+            count=sum(part.count for part in parts),
+            nulls=sum(part.nulls for part in parts),
+            minimum=min((part.minimum for part in present), default=None),
+            maximum=max((part.maximum for part in present), default=None),
+            total=sum(part.total for part in parts),
+            values=values,
+            weights=weights,
+            histogram=sum((part.histogram for part in parts), np.zeros(N_BINS, dtype=np.int64)),
+            histogram_sums=sum((part.histogram_sums for part in parts), np.zeros(N_BINS)),
+        )
+
+    @cached_property
+    def _ranks(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Sketch items in value order and the cumulative weight up to each."""
+        order = np.argsort(self.values, kind="stable")
+        return self.values[order], np.cumsum(self.weights[order])
+
+    def quantiles(self, qs: np.ndarray) -> np.ndarray:
+        """Approximate quantiles at `qs` (0..1); the extremes are exact."""
+        values, upper = self._ranks
+        if self.count == 0 or not len(values):
+            return np.full(len(qs), np.nan)
+        index = np.minimum(np.searchsorted(upper, qs * upper[-1]), len(values) - 1)
+        result = np.clip(values[index], self.minimum, self.maximum)
+        return np.where(qs <= 0, self.minimum, np.where(qs >= 1, self.maximum, result))
+
+    def trimmed_mean(self, trim: float) -> float:
+        """Mean of the values between the `trim` and `1 - trim` quantiles."""
+        if self.count == 0:
+            return np.nan
+        if trim == 0:
+            return self.total / self.count
+        upper = np.cumsum(self.histogram)
+        lower = upper - self.histogram
+        lo, hi = trim * self.count, (1 - trim) * self.count
+        # Each bin contributes the part of its rank interval inside
+        # [lo, hi], at the mean of the values in the bin
+        inside = np.clip(np.minimum(upper, hi) - np.maximum(lower, lo), 0, None)
+        means = np.divide(
+            self.histogram_sums, self.histogram, out=np.zeros(N_BINS), where=self.histogram > 0
+        )
+        return float(means @ inside / inside.sum())
+
+
+class DistributionBuilder:
+    """Accumulate a `Distribution` from chunks of values, NaN meaning NULL."""
+
+    def __init__(self, seed: int = SEED):
+        self.sketch = KLLSketch(seed=seed)
+        self.count = 0
+        self.nulls = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.total = 0.0
+        self.histogram = np.zeros(N_BINS, dtype=np.int64)
+        self.histogram_sums = np.zeros(N_BINS)
+
+    def update(self, values: np.ndarray) -> None:
+        missing = np.isnan(values)
+        self.nulls += int(missing.sum())
+        present = values[~missing]
+        if not len(present):
+            return
+        self.count += len(present)
+        self.total += float(present.sum())
+        self.minimum = min(self.minimum, float(present.min()))
+        self.maximum = max(self.maximum, float(present.max()))
+        bins = bin_index(present)
+        self.histogram += np.bincount(bins, minlength=N_BINS)
+        self.histogram_sums += np.bincount(bins, weights=present, minlength=N_BINS)
+        self.sketch.update(present)
+
+    def result(self) -> Distribution:
+        values, weights = self.sketch.items()
+        return Distribution(
+            count=self.count,
+            nulls=self.nulls,
+            minimum=self.minimum if self.count else None,
+            maximum=self.maximum if self.count else None,
+            total=self.total,
+            values=values,
+            weights=weights,
+            histogram=self.histogram,
+            histogram_sums=self.histogram_sums,
+        )
+
+
+def describe(
+    column: str,
+    label: Optional[str],
+    distributions: Dict[str, Distribution],
+    percentiles: Sequence[float],
+    trim: float,
+    bins_per_decade: int,
+) -> Optional[DistributionResponse]:
+    """
+    Summarise `column` for one label, or for all traders (the merge of
+    every label) when `label` is None. `distributions` maps labels to
+    that column's stored distributions. Returns None for an unknown
+    label. Only the bins from the first to the last occupied one are
+    returned.
+    """
+    if label is None:
+        dist = Distribution.merge([distributions[name] for name in sorted(distributions)])
+    elif label in distributions:
+        dist = distributions[label]
+    else:
+        return None
+    values = dist.quantiles(np.asarray(percentiles, dtype=np.float64) / 100)
+    counts = coarsen(dist.histogram, bins_per_decade)
+    edges = bin_edges(bins_per_decade)
+    occupied = np.flatnonzero(counts)
+    if len(occupied):
+        first, last = occupied[0], occupied[-1]
+        counts, edges = counts[first:last + 1], edges[first:last + 2]
+    else:
+        counts, edges = counts[:0], edges[:0]
+    return DistributionResponse(
+        column=column,
+        label=label,
+        count=dist.count,
+        nulls=dist.nulls,
+        min=_optional(dist.minimum),
+        max=_optional(dist.maximum),
+        mean=dist.total / dist.count if dist.count else None,
+        trim=trim,
+        trimmed_mean=_optional(dist.trimmed_mean(trim)),
+        percentiles=[
+            DistributionPercentile(percentile=float(p), value=_optional(v)) for p, v in zip(percentiles, values)
+        ],
+        histogram=LogHistogram(bins_per_decade=bins_per_decade, edges=edges.tolist(), counts=counts.tolist()),
+    )
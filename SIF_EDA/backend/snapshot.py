@@ -0,0 +1,1017 @@
+"""
+Columnar snapshot of the trader tables.
+
+The data behind the API only changes when the ETL runs, so instead of
+querying Postgres on every request the application can hold
+`trader_agg`, `trader_stats` and the topic tables as NumPy column
+arrays and answer requests with vectorised aggregation, filtering and
+top-k selection over those arrays. Routers fall back to SQL when no
+snapshot is available.
+
+There are two ways to provide the snapshot:
+
+* `SNAPSHOT_DIR=/path`: the ETL (`--snapshot-dir`) writes each
+  generation as a memory-mapped columnar file (see `columnar.py`) and
+  atomically repoints `CURRENT` at it. Every uvicorn worker maps the
+  current file read-only, so the page cache holds one copy shared by
+  all workers, and swaps to a new generation within
+  `SNAPSHOT_POLL_SECONDS` of it being published; no restart is needed.
+* `SNAPSHOT_ENABLED=1`: each worker loads its own in-memory copy from
+  the database at startup. Restart the application after an ETL run to
+  pick up the new data.
+"""
+import logging
+import os
+import re
+import time
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import Request
+from sqlalchemy import Connection, Engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .columnar import ColumnarFile, ColumnarWriter, HashIndex, StringColumn
+from .schemas import (
+    ArchetypeItem,
+    ArchetypeMember,
+    ArchetypeMembersResponse,
+    ArchetypesResponse,
+    FootprintPoint,
+    FootprintScatterResponse,
+    LabelSummaryItem,
+    LabelSummaryResponse,
+    LeaderboardEntry,
+    LeaderboardResponse,
+    MetricRank,
+    OverviewResponse,
+    SimilarTrader,
+    SimilarTradersResponse,
+    TopicShare,
+    TraderProfileResponse,
+    TraderSearchResponse,
+    TraderSummary,
+    TraderTopicProfile,
+)
+from .sketches import N_BINS, Distribution
+from .similarity import (
+    BEHAVIOUR_FEATURES,
+    SimilarityIndex,
+    hash_codes,
+    random_planes,
+    sort_tables,
+    trader_vectors,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "0").lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "1.0"))
+
+# Bumped whenever the set or meaning of the stored columns changes
+SNAPSHOT_FORMAT = 7
+SNAPSHOT_FILE_FORMAT = "snapshot-{:08d}.sifcol"
+SNAPSHOT_FILE_RE = re.compile(r"snapshot-(\d{8})\.sifcol")
+CURRENT_POINTER = "CURRENT"
+
+# Numeric columns of `trader_agg`, including the generated ROI column
+AGG_COLUMNS = [
+    "trader_pnl",
+    "trader_volume",
+    "transaction_count",
+    "transactions_per_day",
+    "volume_per_day",
+    "markets_per_day",
+    "price_levels_consumed",
+    "price_levels_per_transaction",
+    "price_levels_consumed_vw",
+    "price_levels_vw_per_transaction",
+    "price_levels_per_volume",
+    "mean_delta",
+    "std_delta",
+    "mean_time",
+    "std_time",
+    "mean_time_vw",
+    "std_time_vw",
+    "trader_ppv",
+    "mean_tx_value",
+    "std_tx_value",
+    "largest_transformers_topic_share",
+    "largest_tags_topic_share",
+    "roi",
+]
+
+# Columns of the `trader_stats` materialized view
+STATS_COLUMNS = [
+    "z_plpt",
+    "z_plpv",
+    "z_plvwt",
+    "z_std_time_vw",
+    "impact_intensity",
+    "pace_variability",
+]
+
+# Columns of `trader_topic_metrics`
+TOPIC_METRIC_COLUMNS = ["active_topics", "topic_entropy", "niche_score"]
+
+SNAPSHOT_COLUMNS = AGG_COLUMNS + STATS_COLUMNS + TOPIC_METRIC_COLUMNS
+
+# Columns ranked for `/traders/{id}/profile`
+RANK_COLUMNS = AGG_COLUMNS + STATS_COLUMNS
+
+# Sort keys of the `/traders` leaderboard: the column each one ranks and
+# whether it ranks its absolute value. Every key has a matching partial
+# index (see db/create_tables.sql and db/compute_metrics.sql).
+LEADERBOARD_KEYS: Dict[str, Tuple[str, bool]] = {
+    "trader_pnl": ("trader_pnl", False),
+    "abs_pnl": ("trader_pnl", True),
+    "trader_volume": ("trader_volume", False),
+    "roi": ("roi", False),
+    "trader_ppv": ("trader_ppv", False),
+    "transaction_count": ("transaction_count", False),
+    "volume_per_day": ("volume_per_day", False),
+    "markets_per_day": ("markets_per_day", False),
+    "price_levels_per_volume": ("price_levels_per_volume", False),
+    "impact_intensity": ("impact_intensity", False),
+    "pace_variability": ("pace_variability", False),
+}
+SNAPSHOT_FIELDS = ["trader", "trader_label"] + SNAPSHOT_COLUMNS + [
+    "topics",
+    "shares",
+    "all_rank",
+    "footprint_rank",
+    "archetype_id",
+    "archetype_distance",
+]
+
+# Boards of the `trader_top_pnl` materialized view
+TOP_PNL_BOARDS = ["all", "footprint"]
+
+# One row per trader in "C" collation (UTF-8 byte order), which is what
+# `StringColumn` lookups rely on. Each row carries its topic shares as
+# arrays ordered by descending share, and its rank on each board of
+# `trader_top_pnl` and its archetype.
+SNAPSHOT_SQL = "SELECT a.trader, a.trader_label,\n" + ",\n".join(
+    [f"a.{col}::float8 AS {col}" for col in AGG_COLUMNS]
+    + [f"s.{col}::float8 AS {col}" for col in STATS_COLUMNS]
+    + [f"m.{col}::float8 AS {col}" for col in TOPIC_METRIC_COLUMNS]
+) + """,
+    t.topics, t.shares, pa.rank AS all_rank, pf.rank AS footprint_rank,
+    ar.archetype_id, ar.distance AS archetype_distance
+FROM trader_agg a
+LEFT JOIN trader_stats s USING (trader)
+LEFT JOIN trader_topic_metrics m USING (trader)
+LEFT JOIN trader_top_pnl pa ON pa.board = 'all' AND pa.trader = a.trader
+LEFT JOIN trader_top_pnl pf ON pf.board = 'footprint' AND pf.trader = a.trader
+LEFT JOIN trader_archetype ar ON ar.trader = a.trader
+LEFT JOIN LATERAL (
+    SELECT array_agg(ts.topic ORDER BY ts.share DESC, ts.topic) AS topics,
+           array_agg(ts.share::float8 ORDER BY ts.share DESC, ts.topic) AS shares
+    FROM trader_topic_share ts
+    WHERE ts.trader = a.trader
+) t ON true
+ORDER BY a.trader COLLATE "C"
+"""
+
+ROLLUP_SQL = """
+SELECT total_traders, total_volume::float8 AS total_volume,
+       total_pnl::float8 AS total_pnl, average_roi::float8 AS average_roi
+FROM trader_rollup
+"""
+
+# Topic vocabulary, read up front so similarity vectors have a fixed layout
+TOPICS_SQL = """
+SELECT DISTINCT topic COLLATE "C" AS topic FROM trader_topic_share ORDER BY 1
+"""
+
+ARCHETYPES_SQL = """
+SELECT archetype_id, name, member_count, features, centroid
+FROM archetype_centroid
+ORDER BY archetype_id
+"""
+
+DISTRIBUTIONS_SQL = """
+SELECT column_name, trader_label, count, nulls, min_value, max_value, total,
+       sketch_values, sketch_weights, histogram, histogram_sums
+FROM trader_distribution
+ORDER BY column_name, trader_label COLLATE "C"
+"""
+
+# Largest `limit` accepted by `/footprint/scatter`; must not exceed the
+# number of ranked rows per board in `trader_top_pnl`
+MAX_FOOTPRINT_POINTS = 5000
+
+# Prefix matches up to this many rows are sorted by volume directly
+# rather than picked out of the whole volume order
+SEARCH_SORT_THRESHOLD = 4096
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def encode_cursor(value: str, trader: str) -> str:
+    """Keyset cursor of a leaderboard row: its sort value and trader id."""
+    return f"{value}:{trader}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of `encode_cursor`; raises ValueError for a malformed cursor."""
+    value, sep, trader = cursor.partition(":")
+    if not sep:
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return value, trader
+
+
+def column_ranks(values: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    int32 rank of every value among the non-NaN values, i.e. how many
+    are strictly smaller (-1 for NaN), and the number of non-NaN values.
+    """
+    rows = np.flatnonzero(~np.isnan(values))
+    order = rows[np.argsort(values[rows])]
+    ordered = values[order]
+    # Tied values take the position of the first of them
+    positions = np.arange(len(ordered))
+    starts = np.ones(len(ordered), dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    ranks = np.full(len(values), -1, dtype=np.int32)
+    ranks[order] = np.maximum.accumulate(np.where(starts, positions, 0))
+    return ranks, len(ordered)
+
+
+def metric_rank(metric: str, value: Optional[float], rank: Optional[int], count: int) -> MetricRank:
+    """
+    Rank of a trader on one metric. `percentile` follows SQL's
+    `percent_rank()`: the share of the other traders with a value that
+    ranks strictly below, from 0 to 100.
+    """
+    if value is None or rank is None:
+        return MetricRank(metric=metric, value=None, rank=None, count=count, percentile=None)
+    percentile = 100.0 * rank / (count - 1) if count > 1 else 0.0
+    return MetricRank(metric=metric, value=value, rank=rank, count=count, percentile=percentile)
+
+
+def _distributions(entries: List[Dict], arrays: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Distribution]]:
+    """Column -> label -> `Distribution` over the `distribution_*` arrays."""
+    distributions: Dict[str, Dict[str, Distribution]] = {}
+    start = 0
+    for i, entry in enumerate(entries):
+        end = start + entry["items"]
+        distributions.setdefault(entry["column"], {})[entry["label"]] = Distribution(
+            count=entry["count"],
+            nulls=entry["nulls"],
+            minimum=entry["min"],
+            maximum=entry["max"],
+            total=entry["total"],
+            values=arrays["distribution_values"][start:end],
+            weights=arrays["distribution_weights"][start:end],
+            histogram=arrays["distribution_histograms"][i],
+            histogram_sums=arrays["distribution_histogram_sums"][i],
+        )
+        start = end
+    return distributions
+
+
+class Snapshot:
+    """
+    Immutable column store for the read-only endpoints. Rows are sorted
+    by trader id (UTF-8 byte order); every array in `columns` is aligned
+    with `traders`. Labels are stored as int16 codes into `label_names`
+    (-1 for NULL). Topic shares are stored in CSR form (`topic_indptr`,
+    `topic_indices`, `topic_shares`), each trader's entries sorted by
+    descending share. `rollup` holds the dataset totals and `top_pnl`
+    maps each board of `trader_top_pnl` to row indices in rank order,
+    both as computed by the ETL. `archetype_ids` holds each trader's
+    archetype (0 when unassigned) and `archetype_distances` its distance
+    to the centroid; `archetype_items` describes the archetypes.
+    `similarity` is the nearest-neighbour index over trader vectors (see
+    `similarity.py`). `distributions` maps each column and label to the
+    sketches built by the ETL (see `sketches.py`). `ranks` is an
+    (n, len(RANK_COLUMNS)) int32 matrix of each trader's rank on each
+    column (see `column_ranks`), with `rank_counts` the number of
+    ranked traders per column, so a trader's whole profile is one row.
+    `trader_index` maps trader ids to rows with a hash table.
+
+    The arrays may be ordinary in-memory arrays or read-only views over
+    a memory-mapped snapshot file (see `open`).
+    """
+
+    def __init__(
+        self,
+        traders: StringColumn,
+        label_codes: np.ndarray,
+        label_names: List[str],
+        columns: Dict[str, np.ndarray],
+        topic_names: List[str],
+        topic_indptr: np.ndarray,
+        topic_indices: np.ndarray,
+        topic_shares: np.ndarray,
+        rollup: Dict,
+        top_pnl: Dict[str, np.ndarray],
+        archetype_ids: np.ndarray,
+        archetype_distances: np.ndarray,
+        archetype_items: List[ArchetypeItem],
+        similarity: SimilarityIndex,
+        distributions: Dict[str, Dict[str, Distribution]],
+        ranks: np.ndarray,
+        rank_counts: List[int],
+        trader_index: HashIndex,
+        generation: Optional[int] = None,
+    ):
+        self.traders = traders
+        self.label_codes = label_codes
+        self.label_names = label_names
+        self.columns = columns
+        self.topic_names = topic_names
+        self.topic_indptr = topic_indptr
+        self.topic_indices = topic_indices
+        self.topic_shares = topic_shares
+        self.rollup = rollup
+        self.top_pnl = top_pnl
+        self.archetype_ids = archetype_ids
+        self.archetype_distances = archetype_distances
+        self.archetype_items = archetype_items
+        self.similarity = similarity
+        self.distributions = distributions
+        self.ranks = ranks
+        self.rank_counts = rank_counts
+        self.trader_index = trader_index
+        self.generation = generation
+        self._leaderboard_orders: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.traders)
+
+    @classmethod
+    def from_arrays(
+        cls, strings: Dict[str, StringColumn], arrays: Dict[str, np.ndarray], meta: Dict
+    ) -> "Snapshot":
+        """Build a snapshot from the columns produced by `SnapshotBuilder`."""
+        return cls(
+            traders=strings["trader"],
+            label_codes=arrays["label_code"],
+            label_names=meta["label_names"],
+            columns={col: arrays[col] for col in SNAPSHOT_COLUMNS},
+            topic_names=meta["topic_names"],
+            topic_indptr=arrays["topic_indptr"],
+            topic_indices=arrays["topic_index"],
+            topic_shares=arrays["topic_share"],
+            rollup=meta["rollup"],
+            top_pnl={board: arrays[f"top_pnl_{board}"] for board in TOP_PNL_BOARDS},
+            archetype_ids=arrays["archetype_id"],
+            archetype_distances=arrays["archetype_distance"],
+            archetype_items=[ArchetypeItem(**item) for item in meta["archetypes"]],
+            similarity=SimilarityIndex(
+                vectors=arrays["similarity_vector"],
+                planes=arrays["similarity_planes"],
+                codes=arrays["similarity_codes"],
+                order=arrays["similarity_order"],
+            ),
+            distributions=_distributions(meta["distributions"], arrays),
+            ranks=arrays["ranks"],
+            rank_counts=meta["rank_counts"],
+            trader_index=HashIndex(strings["trader"], arrays["trader_slots"]),
+            generation=meta.get("generation"),
+        )
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        """Map a snapshot file written by `write_snapshot_file` read-only."""
+        f = ColumnarFile(path)
+        if f.meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} has snapshot format {f.meta.get('format')!r}")
+        return cls.from_arrays(f.strings, f.arrays, f.meta)
+
+    def row(self, trader_id: str) -> Optional[int]:
+        """Row index of a trader, or None if unknown."""
+        return self.trader_index.find(trader_id)
+
+    def label(self, i: int) -> Optional[str]:
+        code = self.label_codes[i]
+        return None if code < 0 else self.label_names[code]
+
+    @cached_property
+    def _label_groups(self):
+        # Labels coalesced to 'Unknown' and re-coded in sorted order
+        names = set(self.label_names)
+        if np.any(self.label_codes < 0):
+            names.add("Unknown")
+        groups = sorted(names)
+        position = {name: i for i, name in enumerate(groups)}
+        recode = np.array(
+            [position[name] for name in self.label_names] + [position.get("Unknown", -1)],
+            dtype=np.int64,
+        )
+        # Code -1 indexes the last entry, which is 'Unknown'
+        return recode[self.label_codes], groups
+
+    def _summary(self, i: int) -> TraderSummary:
+        pnl = self.columns["trader_pnl"][i]
+        return TraderSummary(
+            trader=self.traders[i],
+            pnl=0.0 if np.isnan(pnl) else float(pnl),
+            roi=_optional(self.columns["roi"][i]),
+            volume=_optional(self.columns["trader_volume"][i]),
+            label=self.label(i),
+        )
+
+    @cached_property
+    def overview(self) -> OverviewResponse:
+        """Dataset totals and the ten traders with the largest |PnL|."""
+        return OverviewResponse(
+            total_traders=self.rollup["total_traders"],
+            total_volume=self.rollup["total_volume"],
+            total_pnl=self.rollup["total_pnl"],
+            average_roi=self.rollup["average_roi"],
+            top_traders=[self._summary(i) for i in self.top_pnl["all"][:10]],
+        )
+
+    @cached_property
+    def label_summary(self) -> LabelSummaryResponse:
+        """Trader count, mean PPV and ROI mean/std per label."""
+        codes, names = self._label_groups
+        n_labels = len(names)
+        counts = np.bincount(codes, minlength=n_labels)
+
+        def grouped_moments(values: np.ndarray):
+            valid = ~np.isnan(values)
+            n = np.bincount(codes[valid], minlength=n_labels)
+            total = np.bincount(codes[valid], weights=values[valid], minlength=n_labels)
+            squares = np.bincount(codes[valid], weights=values[valid] ** 2, minlength=n_labels)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean = np.where(n > 0, total / n, np.nan)
+                var = np.where(n > 0, squares / n - mean ** 2, np.nan)
+            return mean, np.sqrt(np.maximum(var, 0))
+
+        ppv_mean, _ = grouped_moments(self.columns["trader_ppv"])
+        roi_mean, roi_std = grouped_moments(self.columns["roi"])
+        labels = []
+        for code in np.argsort(-counts, kind="stable"):
+            labels.append(
+                LabelSummaryItem(
+                    label=names[code],
+                    count=int(counts[code]),
+                    avg_ppv=_optional(ppv_mean[code]),
+                    roi_mean=_optional(roi_mean[code]),
+                    roi_std=_optional(roi_std[code]),
+                )
+            )
+        return LabelSummaryResponse(labels=labels)
+
+    def footprint_scatter(self, limit: int) -> FootprintScatterResponse:
+        """The `limit` traders with the largest |PnL| as (footprint, edge) points."""
+        idx = self.top_pnl["footprint"][:limit]
+        footprint = self.columns["price_levels_per_volume"][idx]
+        edge = self.columns["roi"][idx]
+        return FootprintScatterResponse(
+            points=[
+                FootprintPoint(trader=self.traders[i], footprint=float(f), edge=float(e))
+                for i, f, e in zip(idx, footprint, edge)
+            ]
+        )
+
+    def _topic_profile(self, i: int) -> TraderTopicProfile:
+        start, end = self.topic_indptr[i], self.topic_indptr[i + 1]
+        topics = [
+            TopicShare(topic=self.topic_names[t], share=float(s))
+            for t, s in zip(self.topic_indices[start:end], self.topic_shares[start:end])
+        ]
+        active = self.columns["active_topics"][i]
+        if np.isnan(active):
+            # Trader exists but has no topic info; return zeros
+            return TraderTopicProfile(active_topics=0, topic_entropy=0.0, niche_score=1.0, topic_shares=topics)
+        return TraderTopicProfile(
+            active_topics=int(active),
+            topic_entropy=float(self.columns["topic_entropy"][i]),
+            niche_score=float(self.columns["niche_score"][i]),
+            topic_shares=topics,
+        )
+
+    def topic_profiles(self, trader_ids: Sequence[str]) -> Dict[str, TraderTopicProfile]:
+        """Topic distribution and metrics of each known trader in `trader_ids`."""
+        profiles = {}
+        for trader_id in trader_ids:
+            i = self.row(trader_id)
+            if i is not None:
+                profiles[trader_id] = self._topic_profile(i)
+        return profiles
+
+    def similar_traders(self, trader_id: str, k: int, exact: bool = False) -> Optional[SimilarTradersResponse]:
+        """The `k` traders most similar to a trader, or None if unknown."""
+        i = self.row(trader_id)
+        if i is None:
+            return None
+        rows, sims, compared, exact = self.similarity.query(i, k, exact)
+        return SimilarTradersResponse(
+            trader=trader_id,
+            exact=exact,
+            compared=compared,
+            neighbours=[
+                SimilarTrader(trader=t, similarity=float(v)) for t, v in zip(self.traders.take(rows), sims)
+            ],
+        )
+
+    def trader_profile(self, trader_id: str) -> Optional[TraderProfileResponse]:
+        """Value and percentile rank of a trader on every ranked column, or None if unknown."""
+        i = self.row(trader_id)
+        if i is None:
+            return None
+        ranks = self.ranks[i].tolist()
+        return TraderProfileResponse(
+            trader=trader_id,
+            label=self.label(i),
+            metrics=[
+                metric_rank(col, _optional(self.columns[col][i]), rank if rank >= 0 else None, count)
+                for col, rank, count in zip(RANK_COLUMNS, ranks, self.rank_counts)
+            ],
+        )
+
+    def _leaderboard_order(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows with a value for a leaderboard key in ascending (value,
+        trader) order, and their values. Sorted on first use per key.
+        """
+        if key not in self._leaderboard_orders:
+            column, absolute = LEADERBOARD_KEYS[key]
+            values = np.abs(self.columns[column]) if absolute else self.columns[column]
+            rows = np.flatnonzero(~np.isnan(values))
+            # Rows are in trader order, so a stable sort breaks ties by trader
+            order = rows[np.argsort(values[rows], kind="stable")]
+            self._leaderboard_orders[key] = (order, values[order])
+        return self._leaderboard_orders[key]
+
+    def leaderboard(
+        self,
+        key: str,
+        descending: bool,
+        label: Optional[str],
+        min_value: Optional[float],
+        max_value: Optional[float],
+        min_volume: Optional[float],
+        cursor: Optional[Tuple[float, str]],
+        limit: int,
+    ) -> LeaderboardResponse:
+        """
+        One page of traders ordered by a leaderboard key, ties broken by
+        trader id in the same direction. The value range and cursor are
+        binary searches over the sorted key; label and volume filters
+        are applied to the remaining rows in growing blocks until the
+        page is full.
+        """
+        order, values = self._leaderboard_order(key)
+        lo = 0 if min_value is None else int(np.searchsorted(values, min_value, "left"))
+        hi = len(values) if max_value is None else int(np.searchsorted(values, max_value, "right"))
+        if cursor is not None:
+            cursor_value, cursor_trader = cursor
+            first = int(np.searchsorted(values, cursor_value, "left"))
+            last = int(np.searchsorted(values, cursor_value, "right"))
+            ties = order[first:last]
+            if descending:
+                hi = min(hi, first + int(np.searchsorted(ties, self.traders.bisect_left(cursor_trader))))
+            else:
+                lo = max(lo, first + int(np.searchsorted(ties, self.traders.bisect_right(cursor_trader))))
+        candidates = order[lo:max(lo, hi)]
+        if descending:
+            candidates = candidates[::-1]
+
+        groups, names = self._label_groups
+        if label is not None and label not in names:
+            candidates = candidates[:0]
+        picked: List[np.ndarray] = []
+        found, start, block = 0, 0, max(4 * (limit + 1), 1024)
+        while start < len(candidates) and found <= limit:
+            chunk = candidates[start:start + block]
+            keep = np.ones(len(chunk), dtype=bool)
+            if label is not None:
+                keep &= groups[chunk] == names.index(label)
+            if min_volume is not None:
+                keep &= self.columns["trader_volume"][chunk] >= min_volume
+            picked.append(chunk[keep])
+            found += int(keep.sum())
+            start += block
+            block *= 2
+        rows = np.concatenate(picked)[:limit + 1] if picked else candidates[:0]
+
+        column, absolute = LEADERBOARD_KEYS[key]
+        entries = []
+        for i in rows[:limit].tolist():
+            value = float(self.columns[column][i])
+            entries.append(
+                LeaderboardEntry(
+                    trader=self.traders[i],
+                    label=self.label(i),
+                    value=abs(value) if absolute else value,
+                    pnl=_optional(self.columns["trader_pnl"][i]),
+                    roi=_optional(self.columns["roi"][i]),
+                    volume=_optional(self.columns["trader_volume"][i]),
+                )
+            )
+        last_entry = entries[-1] if len(rows) > limit else None
+        return LeaderboardResponse(
+            sort=key,
+            order="desc" if descending else "asc",
+            traders=entries,
+            next_cursor=encode_cursor(repr(last_entry.value), last_entry.trader) if last_entry else None,
+        )
+
+    @cached_property
+    def _volume_order(self) -> np.ndarray:
+        """Rows by descending volume (missing volumes last), ties in trader order."""
+        # argsort puts NaN last and the stable sort keeps row order on ties
+        return np.argsort(-self.columns["trader_volume"], kind="stable")
+
+    def search(self, prefix: str, limit: int) -> TraderSearchResponse:
+        """
+        The `limit` traders with the largest volume among those whose id
+        starts with `prefix`. The matches are a contiguous range of the
+        sorted trader column, found by two binary searches. A narrow
+        range is sorted by volume directly; a wide one (a short prefix)
+        is filtered out of the precomputed volume order instead, which
+        reaches `limit` matches after about limit * n / matches rows.
+        Matching is case-insensitive, as the ETL lowercases trader ids.
+        """
+        prefix = prefix.lower()
+        lo, hi = self.traders.prefix_range(prefix)
+        if hi - lo <= SEARCH_SORT_THRESHOLD:
+            volumes = self.columns["trader_volume"][lo:hi]
+            rows = lo + np.argsort(-volumes, kind="stable")[:limit]
+        else:
+            order = self._volume_order
+            picked: List[np.ndarray] = []
+            found, start, block = 0, 0, max(4 * limit, 1024)
+            while start < len(order) and found < limit:
+                chunk = order[start:start + block]
+                chunk = chunk[(chunk >= lo) & (chunk < hi)]
+                picked.append(chunk)
+                found += len(chunk)
+                start += block
+                block *= 2
+            rows = np.concatenate(picked)[:limit]
+        return TraderSearchResponse(prefix=prefix, traders=[self._summary(i) for i in rows.tolist()])
+
+    @cached_property
+    def archetypes(self) -> ArchetypesResponse:
+        """Archetype metadata in id order."""
+        return ArchetypesResponse(archetypes=self.archetype_items)
+
+    @cached_property
+    def _archetype_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row indices grouped by archetype, in trader order within each
+        group, and the start of each group (indexed by archetype id).
+        """
+        ids = self.archetype_ids.astype(np.int64)
+        n_ids = max((item.id for item in self.archetype_items), default=0) + 1
+        order = np.argsort(ids, kind="stable")
+        bounds = np.zeros(n_ids + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=n_ids), out=bounds[1:])
+        return order, bounds
+
+    def _member_rows(self, archetype_id: int, cursor: Optional[str]) -> Optional[np.ndarray]:
+        """Rows of an archetype's members after `cursor`, or None if the archetype does not exist."""
+        if not any(item.id == archetype_id for item in self.archetype_items):
+            return None
+        order, bounds = self._archetype_rows
+        rows = order[bounds[archetype_id]:bounds[archetype_id + 1]]
+        if cursor is not None:
+            # Rows are in trader order, so the first row after the cursor
+            # in the whole column bounds the page
+            rows = rows[np.searchsorted(rows, self.traders.bisect_right(cursor)):]
+        return rows
+
+    def _members(self, rows: np.ndarray) -> List[Tuple[str, float]]:
+        return list(zip(self.traders.take(rows), self.archetype_distances[rows].tolist()))
+
+    def archetype_members(
+        self, archetype_id: int, cursor: Optional[str], limit: int
+    ) -> Optional[ArchetypeMembersResponse]:
+        """One page of an archetype's members in trader order, or None if it does not exist."""
+        rows = self._member_rows(archetype_id, cursor)
+        if rows is None:
+            return None
+        members = [ArchetypeMember(trader=t, distance=d) for t, d in self._members(rows[:limit])]
+        return ArchetypeMembersResponse(
+            archetype_id=archetype_id,
+            members=members,
+            next_cursor=members[-1].trader if len(rows) > limit else None,
+        )
+
+    def archetype_member_chunks(
+        self, archetype_id: int, cursor: Optional[str], chunksize: int
+    ) -> Optional[Iterator[List[Tuple[str, float]]]]:
+        """All of an archetype's members after `cursor` as chunks of (trader, distance)."""
+        rows = self._member_rows(archetype_id, cursor)
+        if rows is None:
+            return None
+        return (self._members(rows[start:start + chunksize]) for start in range(0, len(rows), chunksize))
+
+
+class SnapshotBuilder:
+    """
+    Assemble snapshot columns from chunks of rows of `SNAPSHOT_SQL`.
+
+    Columns are appended to `sink`, which is either a `ColumnarWriter`
+    (the ETL writing a snapshot file) or a `MemorySink` (the API loading
+    a snapshot straight from the database). Label and topic names are
+    dictionary-encoded as rows arrive.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.labels: Dict[str, int] = {}
+        self.topics: Dict[str, int] = {}
+        self.rows = 0
+        self.entries = 0
+        self.generation: Optional[int] = None
+        self.rollup: Optional[Dict] = None
+        self.archetypes: List = []
+        self.distributions: List = []
+        self.rank_counts: List[int] = []
+        self.trader_hashes: List[np.ndarray] = []
+        self.ranks: Dict[str, List[np.ndarray]] = {board: [] for board in TOP_PNL_BOARDS}
+        self.ranked_rows: Dict[str, List[np.ndarray]] = {board: [] for board in TOP_PNL_BOARDS}
+        self.n_topics = 0
+        self.planes: Optional[np.ndarray] = None
+        self.similarity_codes: List[np.ndarray] = []
+        self.similarity_rows: List[np.ndarray] = []
+        sink.append("topic_indptr", np.zeros(1, dtype=np.int64))
+
+    def read_database(self, sync_conn: Connection, chunksize: int) -> None:
+        """
+        Stream every trader from the database into the sink. Everything
+        is read in one transaction so the generation, rollup and rows
+        are consistent with each other.
+        """
+        self.generation = sync_conn.scalar(text("SELECT generation FROM etl_generation"))
+        self.rollup = dict(sync_conn.execute(text(ROLLUP_SQL)).one()._mapping)
+        self.topics = {topic: i for i, topic in enumerate(sync_conn.scalars(text(TOPICS_SQL)))}
+        self.n_topics = len(self.topics)
+        self.planes = random_planes(self.n_topics + len(BEHAVIOUR_FEATURES))
+        self.archetypes = [
+            {
+                "id": row.archetype_id,
+                "name": row.name,
+                "member_count": row.member_count,
+                "centroid": dict(zip(row.features, row.centroid)),
+            }
+            for row in sync_conn.execute(text(ARCHETYPES_SQL))
+        ]
+        self.read_distributions(sync_conn)
+        result = sync_conn.execution_options(stream_results=True).execute(text(SNAPSHOT_SQL))
+        for rows in result.partitions(chunksize):
+            self.add_rows(rows)
+        if self.rows == 0:
+            # Still emit every column so an empty snapshot is well formed
+            self.add_rows([])
+        for board in TOP_PNL_BOARDS:
+            ranks = np.concatenate(self.ranks[board])
+            rows = np.concatenate(self.ranked_rows[board])
+            self.sink.append(f"top_pnl_{board}", rows[np.argsort(ranks)])
+        codes, order = sort_tables(np.concatenate(self.similarity_codes), np.concatenate(self.similarity_rows))
+        self.sink.append("similarity_codes", codes)
+        self.sink.append("similarity_order", order)
+        self.sink.append("similarity_planes", self.planes)
+        self.sink.append("trader_slots", HashIndex.build_slots(np.concatenate(self.trader_hashes)))
+        # Ranks need whole columns, so they are derived from what the
+        # sink holds once every row is in, one column at a time
+        ranks = np.empty((self.rows, len(RANK_COLUMNS)), dtype=np.int32)
+        for j, col in enumerate(RANK_COLUMNS):
+            ranks[:, j], count = column_ranks(self.sink.read(col))
+            self.rank_counts.append(count)
+        self.sink.append("ranks", ranks)
+
+    def read_distributions(self, sync_conn: Connection) -> None:
+        """Copy `trader_distribution` into the sink, one entry per row."""
+        rows = sync_conn.execute(text(DISTRIBUTIONS_SQL)).all()
+        self.distributions = [
+            {
+                "column": row.column_name,
+                "label": row.trader_label,
+                "count": row.count,
+                "nulls": row.nulls,
+                "min": row.min_value,
+                "max": row.max_value,
+                "total": row.total,
+                "items": len(row.sketch_values),
+            }
+            for row in rows
+        ]
+        self.sink.append(
+            "distribution_values", np.asarray([v for row in rows for v in row.sketch_values], dtype=np.float64)
+        )
+        self.sink.append(
+            "distribution_weights", np.asarray([w for row in rows for w in row.sketch_weights], dtype=np.int64)
+        )
+        self.sink.append(
+            "distribution_histograms",
+            np.asarray([row.histogram for row in rows], dtype=np.int64).reshape(len(rows), N_BINS),
+        )
+        self.sink.append(
+            "distribution_histogram_sums",
+            np.asarray([row.histogram_sums for row in rows], dtype=np.float64).reshape(len(rows), N_BINS),
+        )
+
+    def add_rows(self, rows: Sequence) -> None:
+        frame = pd.DataFrame.from_records(rows, columns=SNAPSHOT_FIELDS)
+        traders = frame["trader"].tolist()
+        self.sink.append_strings("trader", traders)
+        self.trader_hashes.append(StringColumn.from_strings(traders).hashes())
+        codes = [
+            -1 if pd.isna(label) else self.labels.setdefault(label, len(self.labels))
+            for label in frame["trader_label"]
+        ]
+        self.sink.append("label_code", np.asarray(codes, dtype=np.int16))
+        for col in SNAPSHOT_COLUMNS:
+            self.sink.append(col, frame[col].to_numpy(dtype="float64", na_value=np.nan))
+        # Topic arrays arrive already ordered by descending share
+        counts = np.array([len(t) if t else 0 for t in frame["topics"]], dtype=np.int64)
+        topic_codes = [
+            self.topics.setdefault(topic, len(self.topics))
+            for topics in frame["topics"] if topics
+            for topic in topics
+        ]
+        shares = [share for values in frame["shares"] if values for share in values]
+        self.sink.append("topic_indptr", self.entries + np.cumsum(counts))
+        self.sink.append("topic_index", np.asarray(topic_codes, dtype=np.int32))
+        self.sink.append("topic_share", np.asarray(shares, dtype=np.float64))
+        vectors = trader_vectors(
+            self.n_topics,
+            counts,
+            np.asarray(topic_codes, dtype=np.int64),
+            np.asarray(shares, dtype=np.float64),
+            frame[BEHAVIOUR_FEATURES].to_numpy(dtype="float64", na_value=np.nan),
+        )
+        self.sink.append("similarity_vector", vectors)
+        # Traders without topics or stats are left out of the LSH tables
+        indexed = np.flatnonzero(vectors.any(axis=1))
+        self.similarity_codes.append(hash_codes(vectors[indexed], self.planes))
+        self.similarity_rows.append(self.rows + indexed)
+        archetype_ids = frame["archetype_id"].to_numpy(dtype="float64", na_value=0)
+        self.sink.append("archetype_id", archetype_ids.astype(np.int16))
+        self.sink.append(
+            "archetype_distance", frame["archetype_distance"].to_numpy(dtype="float64", na_value=np.nan)
+        )
+        for board in TOP_PNL_BOARDS:
+            ranks = frame[f"{board}_rank"].to_numpy(dtype="float64", na_value=np.nan)
+            ranked = np.flatnonzero(~np.isnan(ranks))
+            self.ranks[board].append(ranks[ranked])
+            self.ranked_rows[board].append(self.rows + ranked)
+        self.rows += len(frame)
+        self.entries += int(counts.sum())
+
+    def meta(self, **extra) -> Dict:
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "rows": self.rows,
+            "label_names": list(self.labels),
+            "topic_names": list(self.topics),
+            "generation": self.generation,
+            "rollup": self.rollup,
+            "archetypes": self.archetypes,
+            "distributions": self.distributions,
+            "rank_counts": self.rank_counts,
+            **extra,
+        }
+
+
+class MemorySink:
+    """In-memory counterpart of `ColumnarWriter` used by `SnapshotBuilder`."""
+
+    def __init__(self):
+        self.chunks: Dict[str, List[np.ndarray]] = {}
+        self.strings: Dict[str, List[str]] = {}
+
+    def append(self, name: str, array: np.ndarray) -> None:
+        self.chunks.setdefault(name, []).append(array)
+
+    def append_strings(self, name: str, values: List[str]) -> None:
+        self.strings.setdefault(name, []).extend(values)
+
+    def read(self, name: str) -> np.ndarray:
+        return np.concatenate(self.chunks[name])
+
+    def snapshot(self, meta: Dict) -> Snapshot:
+        arrays = {name: np.concatenate(chunks) for name, chunks in self.chunks.items()}
+        strings = {name: StringColumn.from_strings(v) for name, v in self.strings.items()}
+        return Snapshot.from_arrays(strings, arrays, meta)
+
+
+async def load_snapshot(engine: AsyncEngine, chunksize: int = 50000) -> Snapshot:
+    """Read the trader tables from the database into a new snapshot."""
+    sink = MemorySink()
+    builder = SnapshotBuilder(sink)
+    async with engine.connect() as conn:
+        await conn.run_sync(builder.read_database, chunksize)
+    snapshot = sink.snapshot(builder.meta())
+    logger.info("Loaded snapshot of %d traders", len(snapshot))
+    return snapshot
+
+
+def write_snapshot_file(engine: Engine, path: str, chunksize: int = 50000) -> Snapshot:
+    """
+    Stream the trader tables from the database into a snapshot file at
+    `path`, `chunksize` rows at a time, and return the mapped result.
+    """
+    writer = ColumnarWriter(path)
+    builder = SnapshotBuilder(writer)
+    try:
+        with engine.connect() as conn:
+            builder.read_database(conn, chunksize)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close(builder.meta(created_at=time.time()))
+    return Snapshot.open(path)
+
+
+def snapshot_generations(directory: str) -> List[int]:
+    """Generations of the snapshot files present in `directory`, ascending."""
+    generations = []
+    for name in os.listdir(directory):
+        match = SNAPSHOT_FILE_RE.fullmatch(name)
+        if match:
+            generations.append(int(match.group(1)))
+    return sorted(generations)
+
+
+def publish_snapshot(engine: Engine, directory: str, chunksize: int = 50000, keep: int = 2) -> Snapshot:
+    """
+    Write a snapshot of the current data as the next file in
+    `directory` and point `CURRENT` at it. The pointer is replaced
+    atomically, so workers see either the old or the new file. Older
+    files beyond the `keep` most recent are removed; workers still
+    mapping one keep their view until they switch, since unlinking does
+    not affect existing maps.
+    """
+    os.makedirs(directory, exist_ok=True)
+    existing = snapshot_generations(directory)
+    sequence = (existing[-1] if existing else 0) + 1
+    name = SNAPSHOT_FILE_FORMAT.format(sequence)
+    snapshot = write_snapshot_file(engine, os.path.join(directory, name), chunksize)
+    pointer = os.path.join(directory, CURRENT_POINTER)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(name + "\n")
+    os.replace(pointer + ".tmp", pointer)
+    for old in snapshot_generations(directory)[:-keep]:
+        os.remove(os.path.join(directory, SNAPSHOT_FILE_FORMAT.format(old)))
+    return snapshot
+
+
+class StaticSnapshotSource:
+    """Source serving a single snapshot loaded at startup."""
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+
+    def current(self) -> Snapshot:
+        return self.snapshot
+
+
+class SnapshotFileSource:
+    """
+    Source serving the generation named by `CURRENT` in a snapshot
+    directory. The pointer is checked at most every `poll_interval`
+    seconds; when it changes the new file is mapped and swapped in, and
+    the previous mapping is released once in-flight requests drop it.
+    """
+
+    def __init__(self, directory: str, poll_interval: float = 1.0):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.snapshot: Optional[Snapshot] = None
+        self._name: Optional[str] = None
+        self._checked = float("-inf")
+
+    def current(self) -> Optional[Snapshot]:
+        now = time.monotonic()
+        if now - self._checked >= self.poll_interval:
+            self._checked = now
+            try:
+                self._refresh()
+            except Exception:
+                logger.exception("Could not open snapshot in %s", self.directory)
+        return self.snapshot
+
+    def _refresh(self) -> None:
+        try:
+            with open(os.path.join(self.directory, CURRENT_POINTER)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return
+        if name != self._name:
+            snapshot = Snapshot.open(os.path.join(self.directory, name))
+            self.snapshot, self._name = snapshot, name
+            logger.info("Mapped snapshot %s (%d traders)", name, len(snapshot))
+
+
+def get_snapshot(request: Request) -> Optional[Snapshot]:
+    """
+    FastAPI dependency returning the application's current snapshot, or
+    None when routers should query the database instead.
+    """
+    source = getattr(request.app.state, "snapshots", None)
+    return None if source is None else source.current()
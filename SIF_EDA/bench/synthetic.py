@@ -0,0 +1,193 @@
+"""
+Synthetic trader data for benchmarking.
+
+The real CSV parts are kept in Git LFS, so this script writes
+stand-ins with the same columns as `traders.csv`: every column that
+`cast_types` reads, the trader label and a set of `topic_*` share
+columns. Values are drawn so that the shapes that matter for
+performance are realistic rather than the exact numbers:
+
+* trader ids are unique 42-character hex addresses;
+* volume is log-normal and PnL is volume times a Student-t return, so
+  both are heavy-tailed and PnL is signed; transaction counts are
+  log-normal too, and the per-day, per-transaction and footprint
+  columns are derived from them;
+* topic shares are Dirichlet draws with a small concentration, so most
+  traders have a few dominant topics; shares under 1% are dropped and
+  the rest renormalised, and some traders have no topic shares at all;
+* a few percent of values and a quarter of the labels are missing.
+
+Output is deterministic for a given `--seed` and is written in chunks,
+so 10M rows need no more memory than 100k.
+
+Usage:
+    python bench/synthetic.py --rows 1M --out-dir /tmp/synthetic
+"""
+import argparse
+import os
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Topic columns written as `topic_<name>`
+TOPICS = [
+    "politics",
+    "sport",
+    "economy",
+    "science",
+    "arts",
+    "crypto",
+    "tech",
+    "world",
+    "culture",
+    "weather",
+    "business",
+    "elections",
+]
+
+LABELS = ["sharp", "good", "bad"]
+
+# Dirichlet concentration of the topic mix; below 1 most of a trader's
+# activity falls on a few topics
+TOPIC_CONCENTRATION = 0.3
+# Shares below this are dropped, as the source data stores sparse mixes
+MIN_TOPIC_SHARE = 0.01
+NO_TOPIC_RATE = 0.05
+UNLABELLED_RATE = 0.25
+NULL_RATE = 0.02
+
+CHUNK_ROWS = 200_000
+
+SCALE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype="S1")
+
+
+def parse_rows(value: str) -> int:
+    """Parse a row count such as `100000`, `100k` or `10M`."""
+    value = value.strip().lower()
+    multiplier = SCALE_SUFFIXES.get(value[-1:], 1)
+    if multiplier > 1:
+        value = value[:-1]
+    rows = int(float(value) * multiplier)
+    if rows <= 0:
+        raise argparse.ArgumentTypeError("row count must be positive")
+    return rows
+
+
+def trader_ids(rng: np.random.Generator, n: int) -> np.ndarray:
+    """`n` random 20-byte addresses as `0x`-prefixed lowercase hex."""
+    raw = rng.integers(0, 256, size=(n, 20), dtype=np.uint8)
+    digits = HEX_DIGITS[np.stack([raw >> 4, raw & 15], axis=-1).reshape(n, 40)]
+    return np.char.add("0x", digits.view("S40").ravel().astype(str))
+
+
+def generate_chunk(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    """`n` rows of synthetic traders."""
+    days = rng.uniform(1, 730, n)
+    transactions = np.maximum(1, np.round(rng.lognormal(3.0, 1.5, n))).astype(np.int64)
+    volume = rng.lognormal(6.0, 2.5, n)
+    # Returns have fat tails on both sides, so a few traders dominate |PnL|
+    pnl = volume * np.clip(0.1 * rng.standard_t(3, n), -1, 5)
+    markets = np.maximum(1, np.round(transactions * rng.uniform(0.05, 1, n)))
+    levels = transactions * (1 + rng.poisson(1.5, n))
+    levels_vw = levels * rng.uniform(0.5, 1.5, n)
+    tx_value = volume / transactions
+    mean_time = rng.uniform(0, 1, n)
+
+    topic_shares = rng.dirichlet(np.full(len(TOPICS), TOPIC_CONCENTRATION), n)
+    topic_shares[topic_shares < MIN_TOPIC_SHARE] = 0
+    topic_shares /= topic_shares.sum(axis=1, keepdims=True)
+    topic_shares[rng.random(n) < NO_TOPIC_RATE] = np.nan
+
+    labels = np.asarray(LABELS, dtype=object)[rng.integers(0, len(LABELS), n)]
+    labels[rng.random(n) < UNLABELLED_RATE] = None
+
+    df = pd.DataFrame(
+        {
+            "trader": trader_ids(rng, n),
+            "trader_pnl": pnl,
+            "trader_volume": volume,
+            "transaction_count": transactions,
+            "transactions_per_day": transactions / days,
+            "volume_per_day": volume / days,
+            "markets_per_day": markets / days,
+            "price_levels_consumed": levels,
+            "price_levels_per_transaction": levels / transactions,
+            "price_levels_consumed_vw": levels_vw,
+            "price_levels_vw_per_transaction": levels_vw / transactions,
+            "price_levels_per_volume": levels / volume,
+            "mean_delta": rng.normal(0, 0.05, n),
+            "std_delta": np.abs(rng.normal(0, 0.05, n)),
+            "mean_time": mean_time,
+            "std_time": rng.uniform(0, 0.5, n),
+            "mean_time_vw": np.clip(mean_time + rng.normal(0, 0.1, n), 0, 1),
+            "std_time_vw": rng.uniform(0, 0.5, n),
+            "trader_ppv": pnl / volume,
+            "mean_tx_value": tx_value,
+            "std_tx_value": tx_value * rng.lognormal(0, 0.5, n),
+            "trader_label": labels,
+            "largest_transformers_topic_share": np.nanmax(topic_shares, axis=1, initial=0),
+            "largest_tags_topic_share": rng.uniform(0, 1, n),
+        }
+    )
+    for column in ["trader_pnl", "volume_per_day", "mean_delta", "std_time", "trader_ppv"]:
+        df.loc[rng.random(n) < NULL_RATE, column] = np.nan
+    for j, topic in enumerate(TOPICS):
+        df[f"topic_{topic}"] = topic_shares[:, j]
+    return df
+
+
+def iter_chunks(rows: int, seed: int, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield `rows` synthetic rows in chunks. Each chunk has its own
+    generator seeded from (`seed`, chunk number), so the output does not
+    depend on anything but the seed and the chunk size.
+    """
+    for number, start in enumerate(range(0, rows, chunk_rows)):
+        rng = np.random.default_rng([seed, number])
+        yield generate_chunk(rng, min(chunk_rows, rows - start))
+
+
+def write_parts(out_dir: str, rows: int, parts: int = 3, seed: int = 0, chunk_rows: int = CHUNK_ROWS) -> None:
+    """Write `rows` synthetic rows to `parts` CSV files named like the LFS parts."""
+    os.makedirs(out_dir, exist_ok=True)
+    bounds = np.linspace(0, rows, parts + 1).astype(np.int64)
+    chunks = iter_chunks(rows, seed, chunk_rows)
+    pending = pd.DataFrame()
+    schema = None
+    for part in range(parts):
+        path = os.path.join(out_dir, f"traders_part_{part + 1:02d}.csv")
+        remaining = int(bounds[part + 1] - bounds[part])
+        writer = None
+        while remaining > 0:
+            if pending.empty:
+                pending = next(chunks)
+            piece, pending = pending.iloc[:remaining], pending.iloc[remaining:]
+            # Arrow's CSV writer is an order of magnitude faster than to_csv
+            table = pa.Table.from_pandas(piece, schema=schema, preserve_index=False)
+            schema = table.schema
+            if writer is None:
+                writer = pa_csv.CSVWriter(path, schema, write_options=pa_csv.WriteOptions(quoting_style="needed"))
+            writer.write_table(table)
+            remaining -= len(piece)
+        if writer is not None:
+            writer.close()
+        print(f"Wrote {bounds[part + 1] - bounds[part]} rows to {path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic trader CSV parts")
+    parser.add_argument("--rows", type=parse_rows, default=parse_rows("100k"), help="Number of traders, e.g. 100k, 1M or 10M")
+    parser.add_argument("--out-dir", required=True, help="Directory to write traders_part_*.csv into")
+    parser.add_argument("--parts", type=int, default=3, help="Number of CSV parts (default 3, like the LFS data)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    write_parts(args.out_dir, args.rows, parts=args.parts, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
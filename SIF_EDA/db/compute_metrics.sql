@@ -4,43 +4,8 @@
 
 -- Drop existing views if they exist
 DROP MATERIALIZED VIEW IF EXISTS trader_stats CASCADE;
-DROP MATERIALIZED VIEW IF EXISTS trader_topic_metrics CASCADE;
-
-/*
- * trader_topic_metrics
- *
- * Computes Shannon entropy and niche score for each trader based on their
- * topic share distribution. The formula for entropy is -Σ p_i * ln(p_i).
- * The niche score normalises entropy by the number of active topics: it is
- * 1 - entropy/ln(k) where k is the number of non‑zero topics. A trader
- * specialising in a single topic will have niche_score = 1; a trader
- * spreading uniformly across k topics will have niche_score = 0.
- */
-CREATE MATERIALIZED VIEW trader_topic_metrics AS
-WITH non_zero AS (
-    SELECT trader, topic, share
-    FROM trader_topic_share
-    WHERE share > 0
-),
-agg AS (
-    SELECT
-        trader,
-        COUNT(*)            AS active_topics,
-        SUM(share * LN(share)) AS sum_p_ln_p
-    FROM non_zero
-    GROUP BY trader
-)
-SELECT
-    a.trader,
-    -- Shannon entropy (≥0)
-    COALESCE(-1.0 * a.sum_p_ln_p, 0) AS topic_entropy,
-    -- Normalised niche score
-    CASE
-        WHEN a.active_topics > 1 THEN 1 - ((-1.0 * a.sum_p_ln_p) / LN(a.active_topics))
-        ELSE 1
-    END AS niche_score,
-    a.active_topics
-FROM agg a;
+DROP MATERIALIZED VIEW IF EXISTS trader_rollup CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS trader_top_pnl CASCADE;
 
 /*
  * trader_stats
@@ -85,4 +50,72 @@ SELECT
     (n.z_plpt + n.z_plpv + n.z_plvwt) / 3.0 AS impact_intensity,
     -- Pace variability: z‑score of std_time_vw (how erratic the pacing is)
     n.z_std_time_vw AS pace_variability
-FROM normalised n;
\ No newline at end of file
+FROM normalised n;
+
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY requires a unique index
+CREATE UNIQUE INDEX trader_stats_trader_idx ON trader_stats (trader);
+
+-- Leaderboard indexes for the `/traders/` sort keys read from this view
+-- (see the trader_agg ones in create_tables.sql)
+CREATE INDEX trader_stats_impact_intensity_rank_idx ON trader_stats (impact_intensity, trader COLLATE "C") WHERE impact_intensity IS NOT NULL;
+CREATE INDEX trader_stats_pace_variability_rank_idx ON trader_stats (pace_variability, trader COLLATE "C") WHERE pace_variability IS NOT NULL;
+
+/*
+ * trader_rollup
+ *
+ * Dataset totals shown on the overview page, computed once per ETL run
+ * instead of scanning `trader_agg` on every request. Always one row.
+ */
+CREATE MATERIALIZED VIEW trader_rollup AS
+SELECT
+    true                                AS id,
+    COUNT(*)                            AS total_traders,
+    COALESCE(SUM(trader_volume), 0)     AS total_volume,
+    COALESCE(SUM(trader_pnl), 0)        AS total_pnl,
+    AVG(roi)                            AS average_roi
+FROM trader_agg;
+
+CREATE UNIQUE INDEX trader_rollup_id_idx ON trader_rollup (id);
+
+/*
+ * trader_top_pnl
+ *
+ * The 5000 traders with the largest |PnL| (the largest `limit` accepted by
+ * `/footprint/scatter`), ranked once per ETL run so that endpoints read
+ * the first K rows of a board by index instead of sorting `trader_agg`.
+ * Boards:
+ *   all        every trader, NULL PnL last (overview top traders)
+ *   footprint  traders with both a footprint and an edge (scatter plot)
+ * Ties are broken by trader id so the ranking is deterministic.
+ */
+CREATE MATERIALIZED VIEW trader_top_pnl AS
+WITH ranked AS (
+    SELECT
+        trader,
+        trader_pnl,
+        roi,
+        trader_volume,
+        trader_label,
+        price_levels_per_volume,
+        row_number() OVER (
+            ORDER BY ABS(trader_pnl) DESC NULLS LAST, trader COLLATE "C"
+        ) AS all_rank,
+        CASE WHEN price_levels_per_volume IS NOT NULL AND roi IS NOT NULL THEN
+            row_number() OVER (
+                PARTITION BY price_levels_per_volume IS NOT NULL AND roi IS NOT NULL
+                ORDER BY ABS(trader_pnl) DESC NULLS LAST, trader COLLATE "C"
+            )
+        END AS footprint_rank
+    FROM trader_agg
+)
+SELECT 'all'::text AS board, all_rank AS rank, trader, trader_pnl, roi,
+       trader_volume, trader_label, price_levels_per_volume
+FROM ranked
+WHERE all_rank <= 5000
+UNION ALL
+SELECT 'footprint'::text AS board, footprint_rank AS rank, trader, trader_pnl, roi,
+       trader_volume, trader_label, price_levels_per_volume
+FROM ranked
+WHERE footprint_rank <= 5000;
+
+CREATE UNIQUE INDEX trader_top_pnl_board_rank_idx ON trader_top_pnl (board, rank);
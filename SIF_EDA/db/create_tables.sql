@@ -2,7 +2,12 @@
 -- This file defines the raw and typed tables used by the ETL pipeline.
 
 -- Drop existing tables if they exist. Order matters because of foreign keys.
+DROP TABLE IF EXISTS trader_distribution CASCADE;
+DROP TABLE IF EXISTS trader_archetype CASCADE;
+DROP TABLE IF EXISTS archetype_centroid CASCADE;
 DROP TABLE IF EXISTS trader_topic_share CASCADE;
+DROP TABLE IF EXISTS trader_topic_metrics CASCADE;
+DROP TABLE IF EXISTS trader_fingerprint CASCADE;
 DROP TABLE IF EXISTS trader_agg CASCADE;
 DROP TABLE IF EXISTS staging_trader_agg CASCADE;
 
@@ -32,7 +37,9 @@ CREATE TABLE staging_trader_agg (
     std_tx_value text,
     trader_label text,
     largest_transformers_topic_share text,
-    largest_tags_topic_share text
+    largest_tags_topic_share text,
+    -- row hash computed by the ETL; copied into trader_fingerprint
+    fingerprint text
     -- topic columns remain in staging; they are wide and will be unpivoted
 );
 
@@ -67,6 +74,25 @@ CREATE TABLE trader_agg (
     roi numeric GENERATED ALWAYS AS (trader_pnl / NULLIF(trader_volume, 0)) STORED
 );
 
+-- Leaderboard indexes for `/traders/` (see backend/routers/traders.py),
+-- one per sort key with the trader id as keyset tie-breaker, so any page
+-- in either direction is a range scan. Partial, because traders without
+-- a value are never listed.
+CREATE INDEX trader_agg_trader_pnl_rank_idx ON trader_agg (trader_pnl, trader COLLATE "C") WHERE trader_pnl IS NOT NULL;
+CREATE INDEX trader_agg_trader_volume_rank_idx ON trader_agg (trader_volume, trader COLLATE "C") WHERE trader_volume IS NOT NULL;
+CREATE INDEX trader_agg_roi_rank_idx ON trader_agg (roi, trader COLLATE "C") WHERE roi IS NOT NULL;
+CREATE INDEX trader_agg_trader_ppv_rank_idx ON trader_agg (trader_ppv, trader COLLATE "C") WHERE trader_ppv IS NOT NULL;
+CREATE INDEX trader_agg_transaction_count_rank_idx ON trader_agg (transaction_count, trader COLLATE "C") WHERE transaction_count IS NOT NULL;
+CREATE INDEX trader_agg_volume_per_day_rank_idx ON trader_agg (volume_per_day, trader COLLATE "C") WHERE volume_per_day IS NOT NULL;
+CREATE INDEX trader_agg_markets_per_day_rank_idx ON trader_agg (markets_per_day, trader COLLATE "C") WHERE markets_per_day IS NOT NULL;
+CREATE INDEX trader_agg_price_levels_per_volume_rank_idx ON trader_agg (price_levels_per_volume, trader COLLATE "C") WHERE price_levels_per_volume IS NOT NULL;
+CREATE INDEX trader_agg_abs_pnl_rank_idx ON trader_agg ((abs(trader_pnl)), trader COLLATE "C") WHERE trader_pnl IS NOT NULL;
+
+-- Trader id autocomplete for `/traders/search`. text_pattern_ops lets
+-- `trader LIKE 'abc%'` become an index range scan whatever the database
+-- collation; the primary key index only allows that under "C".
+CREATE INDEX trader_agg_trader_prefix_idx ON trader_agg (trader text_pattern_ops);
+
 -- Long form representation of a trader's topic mix. The ETL script will
 -- unpivot the wide topic columns from the staging table and populate this
 -- table. Each row corresponds to a single topic share for a trader.
@@ -75,4 +101,93 @@ CREATE TABLE trader_topic_share (
     topic text NOT NULL,
     share numeric NOT NULL,
     PRIMARY KEY (trader, topic)
-);
\ No newline at end of file
+);
+
+-- Per-trader topic metrics, computed by the ETL from a sparse trader ×
+-- topic matrix and written as plain rows. Entropy is -Σ p_i * ln(p_i)
+-- over the positive shares; the niche score is 1 - entropy/ln(k) where k
+-- is the number of active topics (1 when k = 1). A trader specialising in
+-- a single topic has niche_score = 1; a trader spreading uniformly across
+-- k topics has niche_score = 0. Traders without topic shares have no row.
+CREATE TABLE trader_topic_metrics (
+    trader text PRIMARY KEY REFERENCES trader_agg (trader) ON DELETE CASCADE,
+    topic_entropy numeric NOT NULL,
+    niche_score numeric NOT NULL,
+    active_topics integer NOT NULL
+);
+
+-- Hash of each trader's source row as last loaded. Incremental ETL runs
+-- compare fresh fingerprints against this table and only upsert rows
+-- whose fingerprint differs.
+CREATE TABLE trader_fingerprint (
+    trader text PRIMARY KEY REFERENCES trader_agg (trader) ON DELETE CASCADE,
+    fingerprint bigint NOT NULL
+);
+
+-- Behavioural archetypes fitted by the ETL's mini-batch k-means stage
+-- (see backend/clustering.py). Ids are assigned by descending size.
+-- `centroid` is in standardised feature space, in the order given by
+-- `features`.
+CREATE TABLE archetype_centroid (
+    archetype_id integer PRIMARY KEY,
+    name text NOT NULL,
+    member_count bigint NOT NULL,
+    features text[] NOT NULL,
+    centroid double precision[] NOT NULL
+);
+
+-- Archetype assignment of every trader and its distance to the centroid
+CREATE TABLE trader_archetype (
+    trader text PRIMARY KEY REFERENCES trader_agg (trader) ON DELETE CASCADE,
+    archetype_id integer NOT NULL REFERENCES archetype_centroid (archetype_id),
+    distance double precision NOT NULL
+);
+
+CREATE INDEX trader_archetype_archetype_idx ON trader_archetype (archetype_id, trader COLLATE "C");
+
+-- Distribution of every numeric `trader_agg` column per trader label
+-- (NULL labels as 'Unknown'), built by the ETL in one streaming pass
+-- (see backend/sketches.py). `sketch_values`/`sketch_weights` are the
+-- items of a KLL quantile sketch; `histogram` and `histogram_sums` are
+-- the count and sum of values in each fixed signed log10 bin.
+CREATE TABLE trader_distribution (
+    column_name text NOT NULL,
+    trader_label text NOT NULL,
+    count bigint NOT NULL,
+    nulls bigint NOT NULL,
+    min_value double precision,
+    max_value double precision,
+    total double precision NOT NULL,
+    sketch_values double precision[] NOT NULL,
+    sketch_weights bigint[] NOT NULL,
+    histogram bigint[] NOT NULL,
+    histogram_sums double precision[] NOT NULL,
+    PRIMARY KEY (column_name, trader_label)
+);
+
+-- Data generation counter, bumped by the ETL after every load that
+-- changes the data. The API uses it to invalidate cached responses. It is
+-- deliberately not dropped above so the counter keeps increasing across
+-- schema rebuilds and never repeats a generation that clients may have
+-- cached.
+CREATE TABLE IF NOT EXISTS etl_generation (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    generation bigint NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+INSERT INTO etl_generation (generation) VALUES (0) ON CONFLICT (id) DO NOTHING;
+
+-- One row per materialized view refresh (see backend/refresh.py), read by
+-- `/refresh/status`. Like `etl_generation` it is not dropped above, so the
+-- refresh history survives schema rebuilds.
+CREATE TABLE IF NOT EXISTS matview_refresh_log (
+    id bigserial PRIMARY KEY,
+    view_name text NOT NULL,
+    status text NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'succeeded', 'failed')),
+    started_at timestamptz NOT NULL DEFAULT now(),
+    finished_at timestamptz,
+    seconds double precision,
+    row_count bigint,
+    error text
+);
+CREATE INDEX IF NOT EXISTS matview_refresh_log_view_idx ON matview_refresh_log (view_name, id DESC);
@@ -0,0 +1,80 @@
+-- Derived tables for the embedded DuckDB backend: the materialized views
+-- of db/compute_metrics.sql (see there for what each computes) as plain
+-- tables, since DuckDB has no materialized views. `etl.py` runs this
+-- script after every load in place of REFRESH MATERIALIZED VIEW; each
+-- statement swaps its table in atomically.
+
+CREATE OR REPLACE TABLE trader_stats AS
+WITH stats AS (
+    SELECT
+        AVG(price_levels_per_transaction)   AS mean_plpt,
+        STDDEV_POP(price_levels_per_transaction) AS sd_plpt,
+        AVG(price_levels_per_volume)        AS mean_plpv,
+        STDDEV_POP(price_levels_per_volume) AS sd_plpv,
+        AVG(price_levels_vw_per_transaction)   AS mean_plvwt,
+        STDDEV_POP(price_levels_vw_per_transaction) AS sd_plvwt,
+        AVG(std_time_vw)                    AS mean_std_time_vw,
+        STDDEV_POP(std_time_vw)             AS sd_std_time_vw
+    FROM trader_agg
+),
+normalised AS (
+    SELECT
+        t.trader,
+        -- z‑scores for the three impact metrics
+        CASE WHEN s.sd_plpt > 0 THEN (t.price_levels_per_transaction - s.mean_plpt) / s.sd_plpt ELSE NULL END AS z_plpt,
+        CASE WHEN s.sd_plpv > 0 THEN (t.price_levels_per_volume - s.mean_plpv) / s.sd_plpv ELSE NULL END AS z_plpv,
+        CASE WHEN s.sd_plvwt > 0 THEN (t.price_levels_vw_per_transaction - s.mean_plvwt) / s.sd_plvwt ELSE NULL END AS z_plvwt,
+        -- z‑score for time variability
+        CASE WHEN s.sd_std_time_vw > 0 THEN (t.std_time_vw - s.mean_std_time_vw) / s.sd_std_time_vw ELSE NULL END AS z_std_time_vw
+    FROM trader_agg t, stats s
+)
+SELECT
+    n.trader,
+    n.z_plpt,
+    n.z_plpv,
+    n.z_plvwt,
+    n.z_std_time_vw,
+    -- Impact intensity: average of the three price level z‑scores
+    (n.z_plpt + n.z_plpv + n.z_plvwt) / 3.0 AS impact_intensity,
+    -- Pace variability: z‑score of std_time_vw (how erratic the pacing is)
+    n.z_std_time_vw AS pace_variability
+FROM normalised n;
+
+CREATE OR REPLACE TABLE trader_rollup AS
+SELECT
+    true                                AS id,
+    COUNT(*)                            AS total_traders,
+    COALESCE(SUM(trader_volume), 0)     AS total_volume,
+    COALESCE(SUM(trader_pnl), 0)        AS total_pnl,
+    AVG(roi)                            AS average_roi
+FROM trader_agg;
+
+CREATE OR REPLACE TABLE trader_top_pnl AS
+WITH ranked AS (
+    SELECT
+        trader,
+        trader_pnl,
+        roi,
+        trader_volume,
+        trader_label,
+        price_levels_per_volume,
+        row_number() OVER (
+            ORDER BY ABS(trader_pnl) DESC NULLS LAST, trader COLLATE "C"
+        ) AS all_rank,
+        CASE WHEN price_levels_per_volume IS NOT NULL AND roi IS NOT NULL THEN
+            row_number() OVER (
+                PARTITION BY price_levels_per_volume IS NOT NULL AND roi IS NOT NULL
+                ORDER BY ABS(trader_pnl) DESC NULLS LAST, trader COLLATE "C"
+            )
+        END AS footprint_rank
+    FROM trader_agg
+)
+SELECT 'all'::text AS board, all_rank AS rank, trader, trader_pnl, roi,
+       trader_volume, trader_label, price_levels_per_volume
+FROM ranked
+WHERE all_rank <= 5000
+UNION ALL
+SELECT 'footprint'::text AS board, footprint_rank AS rank, trader, trader_pnl, roi,
+       trader_volume, trader_label, price_levels_per_volume
+FROM ranked
+WHERE footprint_rank <= 5000;
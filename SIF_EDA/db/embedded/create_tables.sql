@@ -0,0 +1,122 @@
+-- Schema for the embedded DuckDB backend (DATABASE_URL=duckdb:///...).
+-- Mirrors db/create_tables.sql for a single-node deployment without a
+-- database server; `etl.py` applies it before every load, and
+-- db/embedded/compute_metrics.sql after it. Differences from the Postgres
+-- schema:
+--   * numeric columns are DOUBLE: DuckDB's unqualified DECIMAL keeps only
+--     three decimal places, and the API reads every metric as float8;
+--   * `roi` is a virtual generated column (DuckDB does not store them);
+--   * no foreign keys, as DuckDB has no ON DELETE CASCADE (the ETL clears
+--     every table on a full reload, and incremental loads need Postgres);
+--   * no staging table, since the ETL appends its DataFrames directly;
+--   * no secondary indexes: DuckDB answers the leaderboard, prefix and
+--     archetype queries with columnar scans and zone maps.
+
+DROP TABLE IF EXISTS trader_top_pnl;
+DROP TABLE IF EXISTS trader_rollup;
+DROP TABLE IF EXISTS trader_stats;
+DROP TABLE IF EXISTS trader_distribution;
+DROP TABLE IF EXISTS trader_archetype;
+DROP TABLE IF EXISTS archetype_centroid;
+DROP TABLE IF EXISTS trader_topic_share;
+DROP TABLE IF EXISTS trader_topic_metrics;
+DROP TABLE IF EXISTS trader_fingerprint;
+DROP TABLE IF EXISTS trader_agg;
+
+CREATE TABLE trader_agg (
+    trader text PRIMARY KEY,
+    trader_pnl double,
+    trader_volume double,
+    transaction_count integer,
+    transactions_per_day double,
+    volume_per_day double,
+    markets_per_day double,
+    price_levels_consumed double,
+    price_levels_per_transaction double,
+    price_levels_consumed_vw double,
+    price_levels_vw_per_transaction double,
+    price_levels_per_volume double,
+    mean_delta double,
+    std_delta double,
+    mean_time double,
+    std_time double,
+    mean_time_vw double,
+    std_time_vw double,
+    trader_ppv double,
+    mean_tx_value double,
+    std_tx_value double,
+    trader_label text,
+    largest_transformers_topic_share double,
+    largest_tags_topic_share double,
+    roi double GENERATED ALWAYS AS (trader_pnl / NULLIF(trader_volume, 0)) VIRTUAL
+);
+
+CREATE TABLE trader_topic_share (
+    trader text NOT NULL,
+    topic text NOT NULL,
+    share double NOT NULL,
+    PRIMARY KEY (trader, topic)
+);
+
+CREATE TABLE trader_topic_metrics (
+    trader text PRIMARY KEY,
+    topic_entropy double NOT NULL,
+    niche_score double NOT NULL,
+    active_topics integer NOT NULL
+);
+
+CREATE TABLE trader_fingerprint (
+    trader text PRIMARY KEY,
+    fingerprint bigint NOT NULL
+);
+
+CREATE TABLE archetype_centroid (
+    archetype_id integer PRIMARY KEY,
+    name text NOT NULL,
+    member_count bigint NOT NULL,
+    features text[] NOT NULL,
+    centroid double[] NOT NULL
+);
+
+CREATE TABLE trader_archetype (
+    trader text PRIMARY KEY,
+    archetype_id integer NOT NULL,
+    distance double NOT NULL
+);
+
+CREATE TABLE trader_distribution (
+    column_name text NOT NULL,
+    trader_label text NOT NULL,
+    count bigint NOT NULL,
+    nulls bigint NOT NULL,
+    min_value double,
+    max_value double,
+    total double NOT NULL,
+    sketch_values double[] NOT NULL,
+    sketch_weights bigint[] NOT NULL,
+    histogram bigint[] NOT NULL,
+    histogram_sums double[] NOT NULL,
+    PRIMARY KEY (column_name, trader_label)
+);
+
+-- Kept across rebuilds, as in the Postgres schema
+CREATE TABLE IF NOT EXISTS etl_generation (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    generation bigint NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+INSERT INTO etl_generation (generation) VALUES (0) ON CONFLICT (id) DO NOTHING;
+
+-- Stays empty: the derived tables are rebuilt by the ETL in the load's
+-- process rather than refreshed in the background
+CREATE SEQUENCE IF NOT EXISTS matview_refresh_log_id_seq;
+CREATE TABLE IF NOT EXISTS matview_refresh_log (
+    id bigint PRIMARY KEY DEFAULT nextval('matview_refresh_log_id_seq'),
+    view_name text NOT NULL,
+    status text NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'succeeded', 'failed')),
+    started_at timestamptz NOT NULL DEFAULT now(),
+    finished_at timestamptz,
+    seconds double,
+    row_count bigint,
+    error text
+);
@@ -3,7 +3,54 @@ import { useEffect, useState } from 'react'
 interface ArchetypeItem {
   id: number
   name: string
-  members: string[]
+  member_count: number
+  centroid: Record<string, number>
+}
+
+interface MembersPage {
+  members: { trader: string; distance: number }[]
+  next_cursor: string | null
+}
+
+const PAGE_SIZE = 10
+
+function ArchetypeCard({ archetype }: { archetype: ArchetypeItem }) {
+  const [members, setMembers] = useState<string[]>([])
+  const [cursor, setCursor] = useState<string | null>(null)
+  const [done, setDone] = useState(false)
+
+  async function loadMore() {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) })
+    if (cursor) params.set('cursor', cursor)
+    const res = await fetch(`http://localhost:8000/archetypes/${archetype.id}/members?${params}`)
+    if (!res.ok) return
+    const json: MembersPage = await res.json()
+    setMembers((prev) => [...prev, ...json.members.map((m) => m.trader)])
+    setCursor(json.next_cursor)
+    setDone(json.next_cursor === null)
+  }
+
+  useEffect(() => {
+    loadMore()
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [archetype.id])
+
+  return (
+    <div className="p-4 bg-white rounded shadow">
+      <h2 className="text-lg font-medium">{archetype.name}</h2>
+      <p className="text-sm text-gray-600">{archetype.member_count} traders</p>
+      <div className="mt-2 flex flex-wrap gap-2">
+        {members.map((t) => (
+          <span key={t} className="px-2 py-1 bg-gray-200 text-xs font-mono rounded">{t}</span>
+        ))}
+        {!done && (
+          <button onClick={loadMore} className="px-2 py-1 bg-gray-300 text-xs rounded">
+            More…
+          </button>
+        )}
+      </div>
+    </div>
+  )
 }
 
 export default function ArchetypesPage() {
@@ -31,21 +78,10 @@ export default function ArchetypesPage() {
       {!error && (
         <div className="space-y-4">
           {items.map((archetype) => (
-            <div key={archetype.id} className="p-4 bg-white rounded shadow">
-              <h2 className="text-lg font-medium">{archetype.name}</h2>
-              <p className="text-sm text-gray-600">{archetype.members.length} traders</p>
-              <div className="mt-2 flex flex-wrap gap-2">
-                {archetype.members.slice(0, 10).map((t) => (
-                  <span key={t} className="px-2 py-1 bg-gray-200 text-xs font-mono rounded">{t}</span>
-                ))}
-                {archetype.members.length > 10 && (
-                  <span className="px-2 py-1 bg-gray-300 text-xs rounded">…</span>
-                )}
-              </div>
-            </div>
+            <ArchetypeCard key={archetype.id} archetype={archetype} />
           ))}
         </div>
       )}
     </main>
   )
-}
\ No newline at end of file
+}
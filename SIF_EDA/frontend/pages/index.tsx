@@ -8,6 +8,11 @@ interface TraderSummary {
   label: string | null
 }
 
+interface TopicProfile {
+  niche_score: number
+  topic_shares: { topic: string; share: number }[]
+}
+
 interface OverviewResponse {
   total_traders: number
   total_volume: number
@@ -18,6 +23,7 @@ interface OverviewResponse {
 
 export default function Home() {
   const [data, setData] = useState<OverviewResponse | null>(null)
+  const [topics, setTopics] = useState<Record<string, TopicProfile>>({})
   const [error, setError] = useState<string | null>(null)
 
   useEffect(() => {
@@ -25,8 +31,12 @@ export default function Home() {
       try {
         const res = await fetch('http://localhost:8000/overview')
         if (!res.ok) throw new Error(`HTTP ${res.status}`)
-        const json = await res.json()
+        const json: OverviewResponse = await res.json()
         setData(json)
+        // Topic profiles of every top trader in one request
+        const params = new URLSearchParams(json.top_traders.map((t) => ['trader', t.trader]))
+        const topicRes = await fetch(`http://localhost:8000/topics/traders?${params}`)
+        if (topicRes.ok) setTopics((await topicRes.json()).traders)
       } catch (err: any) {
         setError(err.message)
       }
@@ -70,6 +80,8 @@ export default function Home() {
                     <th className="px-4 py-2 text-right">ROI</th>
                     <th className="px-4 py-2 text-right">Volume</th>
                     <th className="px-4 py-2">Label</th>
+                    <th className="px-4 py-2">Top Topic</th>
+                    <th className="px-4 py-2 text-right">Niche</th>
                   </tr>
                 </thead>
                 <tbody>
@@ -80,6 +92,8 @@ export default function Home() {
                       <td className="px-4 py-2 text-right">{t.roi !== null ? (t.roi * 100).toFixed(2) + '%' : '—'}</td>
                       <td className="px-4 py-2 text-right">{t.volume !== null ? t.volume.toLocaleString(undefined, { maximumFractionDigits: 2 }) : '—'}</td>
                       <td className="px-4 py-2">{t.label ?? '—'}</td>
+                      <td className="px-4 py-2">{topics[t.trader]?.topic_shares[0]?.topic ?? '—'}</td>
+                      <td className="px-4 py-2 text-right">{topics[t.trader] ? topics[t.trader].niche_score.toFixed(2) : '—'}</td>
                     </tr>
                   ))}
                 </tbody>